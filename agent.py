@@ -10,8 +10,8 @@ import json
 import os
 from datetime import datetime, timedelta
 
-from services.box_service import BoxService
-from services.dropbox_service import DropboxService
+from services.box_service import get_default_box_service
+from services.dropbox_service import get_default_dropbox_service
 from services.google_drive_service import GoogleDriveService
 from services.gmail_service import GmailService
 from services.google_calendar_service import GoogleCalendarService
@@ -67,8 +67,8 @@ class MistralAgent:
         self.max_context_messages = max_context_messages
         
         # Initialize cloud services
-        self.box_service = BoxService()
-        self.dropbox_service = DropboxService()
+        self.box_service = get_default_box_service()
+        self.dropbox_service = get_default_dropbox_service()
         self.google_drive_service = GoogleDriveService()
         self.gmail_service = GmailService()
         self.google_calendar_service = GoogleCalendarService()
@@ -1,12 +1,13 @@
 import os
+import asyncio
 import discord
 import logging
 from discord.ext import commands
 from dotenv import load_dotenv
 from agent import MistralAgent
-from services.box_service import BoxService
+from services.box_service import get_default_box_service
 from services.gmail_service import GmailService
-from services.dropbox_service import DropboxService
+from services.dropbox_service import get_default_dropbox_service
 from services.google_drive_service import GoogleDriveService
 from services.google_calendar_service import GoogleCalendarService
 from server import start_server 
@@ -23,9 +24,20 @@ logging.basicConfig(level=logging.INFO,
 # Load the environment variables
 load_dotenv()
 
+class Bot(commands.Bot):
+    """The Discord bot, which also releases the shared cloud service sessions when it shuts down."""
+    
+    async def close(self):
+        try:
+            await get_default_box_service().close()
+            await get_default_dropbox_service().close()
+        except Exception as e:
+            logger.error(f"Error closing service sessions: {str(e)}")
+        await super().close()
+
 # Create the bot with all intents
 intents = discord.Intents.all()
-bot = commands.Bot(command_prefix=PREFIX, intents=intents)
+bot = Bot(command_prefix=PREFIX, intents=intents)
 
 # Initialize agent with Semantic Kernel and cloud storage plugins
 agent = MistralAgent()
@@ -34,9 +46,9 @@ agent = MistralAgent()
 token = os.getenv("DISCORD_TOKEN")
 
 # Initialize cloud service instances
-box_service = BoxService()
+box_service = get_default_box_service()
 gmail_service = GmailService()
-dropbox_service = DropboxService()
+dropbox_service = get_default_dropbox_service()
 google_drive_service = GoogleDriveService()
 google_calendar_service = GoogleCalendarService()
 
@@ -68,6 +80,13 @@ async def send_split_message(message: discord.Message, response: str | list[str]
         logger.error(error_msg)
         await message.channel.send(error_msg[:1900])
 
+@bot.event
+async def setup_hook():
+    """
+    Called once before the bot connects to Discord. Starts the OAuth callback server on the bot's event loop.
+    """
+    await start_server(bot)
+
 @bot.event
 async def on_ready():
     """
@@ -149,7 +168,6 @@ async def box_upload(ctx):
     
     try:
         # Upload to Box
-        box_service = BoxService()
         file_info = await box_service.upload_file(str(ctx.author.id), file_path, attachment.filename)
         
         # Send confirmation
@@ -188,7 +206,6 @@ async def dropbox_upload(ctx):
     
     try:
         # Upload to Dropbox
-        dropbox_service = DropboxService()
         dropbox_path = f"/{attachment.filename}"  # Will be stored in root folder
         file_info = await dropbox_service.upload_file(str(ctx.author.id), file_path, dropbox_path)
         
@@ -689,8 +706,14 @@ async def cloud_status(ctx):
 
     await ctx.send(embed=embed)
 
-# Start the web server in the background
-server_thread = start_server(bot)
+# Use uvloop's faster event loop when it is installed (it comes with uvicorn[standard] on
+# Linux/macOS); bot.run creates the loop, so the policy has to be set first
+try:
+    import uvloop
+except ImportError:
+    pass
+else:
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
 
 # Start the bot
 bot.run(token)
\ No newline at end of file
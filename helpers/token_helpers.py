@@ -1,35 +1,170 @@
 import os
-import json
+import base64
+import asyncio
 import logging
+import sqlite3
+import threading
+import orjson
 from datetime import datetime
+from functools import lru_cache
 from cryptography.fernet import Fernet
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from azure.core import MatchConditions
+from azure.core.exceptions import ResourceNotFoundError, ResourceNotModifiedError
 from azure.storage.blob import BlobServiceClient
 
 # Setup logging
 logger = logging.getLogger("token_helpers")
 
+# Local token database, used when Azure Blob Storage is not configured
+LOCAL_TOKEN_DB = "user_tokens.db"
+# Former local JSON token file, imported into the database when found
+LEGACY_TOKEN_FILE = "user_tokens.json"
+
+# Serializes use of the shared database connection across threads
+_db_lock = threading.Lock()
+
+# Leading byte of AES-GCM encrypted tokens; Fernet tokens always start with 0x80
+AESGCM_VERSION = b"\x01"
+AESGCM_NONCE_SIZE = 12
+
+# Seconds to collect token writes before uploading them to Azure Blob Storage together
+BLOB_FLUSH_DELAY = 0.05
+# A failed flush is retried with exponential backoff, up to this many times and this many seconds apart
+BLOB_FLUSH_MAX_RETRIES = 6
+BLOB_FLUSH_MAX_RETRY_DELAY = 30
+
+
+@lru_cache(maxsize=None)
+def _get_connection(path):
+    """
+    Open the local token database once per process, creating the tokens table if needed.
+    
+    Args:
+        path (str): Path to the SQLite database file
+        
+    Returns:
+        sqlite3.Connection: A connection in autocommit mode
+    """
+    connection = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS tokens ("
+        "user_id TEXT NOT NULL, platform TEXT NOT NULL, service TEXT NOT NULL, data TEXT NOT NULL, "
+        "PRIMARY KEY (user_id, platform, service))"
+    )
+    return connection
+
+
+def _import_legacy_tokens(connection):
+    """
+    Copy tokens from the former JSON token file into the database, then set the file aside.
+    
+    Args:
+        connection (sqlite3.Connection): The token database connection
+    """
+    # Opening directly avoids a separate existence check on every startup
+    try:
+        with open(LEGACY_TOKEN_FILE, 'rb') as f:
+            tokens = orjson.loads(f.read())
+    except FileNotFoundError:
+        return
+    
+    # Keys were stored as "{user_id}_{platform}_{service}"
+    rows = [(*key.rsplit("_", 2), orjson.dumps(token_data).decode()) for key, token_data in tokens.items() if key.count("_") >= 2]
+    with _db_lock:
+        connection.executemany(
+            "INSERT OR IGNORE INTO tokens (user_id, platform, service, data) VALUES (?, ?, ?, ?)",
+            rows
+        )
+    
+    os.replace(LEGACY_TOKEN_FILE, LEGACY_TOKEN_FILE + ".imported")
+    logger.info("Imported %s tokens from %s", len(rows), LEGACY_TOKEN_FILE)
+
+
+@lru_cache(maxsize=4)
+def _fernet(encryption_key):
+    """
+    Get a Fernet instance for a key, built once and reused across calls.
+    
+    Args:
+        encryption_key (bytes): The encryption key
+        
+    Returns:
+        Fernet: The Fernet instance for the key
+    """
+    return Fernet(encryption_key)
+
+
+@lru_cache(maxsize=4)
+def _aesgcm(encryption_key):
+    """
+    Get an AES-GCM cipher for a key, built once and reused across calls.
+    
+    The 256-bit AES key is derived from the configured key with HKDF so the same
+    key material is never used directly by two algorithms.
+    
+    Args:
+        encryption_key (bytes): The encryption key
+        
+    Returns:
+        AESGCM: The AES-GCM cipher for the key
+    """
+    key = HKDF(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=None,
+        info=b"token-encryption-aesgcm"
+    ).derive(base64.urlsafe_b64decode(encryption_key))
+    return AESGCM(key)
+
+
+def _decrypt(aesgcm, fernet, encrypted_token):
+    """
+    Decrypt a token, falling back to Fernet for tokens encrypted before AES-GCM was adopted.
+    
+    Args:
+        aesgcm (AESGCM): The AES-GCM cipher
+        fernet (Fernet): The Fernet instance for legacy tokens
+        encrypted_token (str): The encrypted token string
+        
+    Returns:
+        str: The decrypted token string
+    """
+    data = base64.urlsafe_b64decode(encrypted_token)
+    if data[:1] == AESGCM_VERSION:
+        nonce_end = 1 + AESGCM_NONCE_SIZE
+        return aesgcm.decrypt(data[1:nonce_end], data[nonce_end:], None).decode()
+    return fernet.decrypt(encrypted_token.encode()).decode()
+
+
 class TokenEncryptionHelper:
     """Helper class for encrypting and decrypting tokens."""
     
     @staticmethod
     def encrypt_token(token_str, encryption_key):
         """
-        Encrypts a token string using Fernet symmetric encryption.
+        Encrypts a token string using AES-GCM authenticated encryption.
         
         Args:
-            token_str (str): The token string to encrypt
+            token_str (str | bytes): The token string to encrypt, or its UTF-8 bytes
             encryption_key (bytes): The encryption key
             
         Returns:
-            str: The encrypted token as a string
+            str: The encrypted token as a string (version byte, nonce and ciphertext, base64 encoded)
         """
-        f = Fernet(encryption_key)
-        return f.encrypt(token_str.encode()).decode()
+        plaintext = token_str if isinstance(token_str, bytes) else token_str.encode()
+        nonce = os.urandom(AESGCM_NONCE_SIZE)
+        ciphertext = _aesgcm(encryption_key).encrypt(nonce, plaintext, None)
+        return base64.urlsafe_b64encode(AESGCM_VERSION + nonce + ciphertext).decode()
     
     @staticmethod
     def decrypt_token(encrypted_token, encryption_key):
         """
-        Decrypts an encrypted token string using Fernet symmetric encryption.
+        Decrypts an encrypted token string, accepting both AES-GCM and older Fernet tokens.
         
         Args:
             encrypted_token (str): The encrypted token string
@@ -38,13 +173,40 @@ class TokenEncryptionHelper:
         Returns:
             str: The decrypted token string
         """
-        f = Fernet(encryption_key)
-        return f.decrypt(encrypted_token.encode()).decode()
+        return _decrypt(_aesgcm(encryption_key), _fernet(encryption_key), encrypted_token)
+    
+    @staticmethod
+    def is_legacy_token(encrypted_token):
+        """
+        Checks whether a token was encrypted with Fernet before AES-GCM was adopted.
+        
+        Args:
+            encrypted_token (str): The encrypted token string
+            
+        Returns:
+            bool: True if the token should be re-encrypted with AES-GCM
+        """
+        return base64.urlsafe_b64decode(encrypted_token)[:1] != AESGCM_VERSION
+    
+    @staticmethod
+    def create_decryptor(encryption_key):
+        """
+        Creates a function that decrypts token strings with ciphers resolved once.
+        
+        Args:
+            encryption_key (bytes): The encryption key
+            
+        Returns:
+            callable: Function taking an encrypted token string and returning the decrypted string
+        """
+        aesgcm = _aesgcm(encryption_key)
+        f = _fernet(encryption_key)
+        return lambda encrypted_token: _decrypt(aesgcm, f, encrypted_token)
     
     @staticmethod
     def generate_key():
         """
-        Generates a new Fernet encryption key.
+        Generates a new encryption key (a Fernet key, which also seeds the AES-GCM key).
         
         Returns:
             bytes: A new encryption key
@@ -66,16 +228,22 @@ class TokenStorageManager:
         self.blob_name = blob_name
         self.container_name = container_name
         
+        # Blob writes waiting to be uploaded: key -> token data, or None for a deletion
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        # Held for a whole download-apply-upload cycle so flushes never overwrite each other
+        self._flush_lock = threading.Lock()
+        self._flush_timer = None
+        self._flush_failures = 0
+        # Last downloaded blob contents as (etag, tokens), reused while the blob is unchanged
+        self._blob_cache = (None, {})
+        
         # Get the connection string from environment variable
         connection_string = os.getenv("AZURE_STORAGE_CONNECTION_STRING")
         if not connection_string:
-            logger.warning("AZURE_STORAGE_CONNECTION_STRING not found. Using local file storage.")
+            logger.warning("AZURE_STORAGE_CONNECTION_STRING not found. Using local database storage.")
             self.use_blob_storage = False
-            self.storage_file = "user_tokens.json"
-            # Initialize the storage file if it doesn't exist
-            if not os.path.exists(self.storage_file):
-                with open(self.storage_file, 'w') as f:
-                    json.dump({}, f)
+            self._use_local_storage()
         else:
             self.use_blob_storage = True
             self.blob_service_client = BlobServiceClient.from_connection_string(connection_string)
@@ -85,10 +253,17 @@ class TokenStorageManager:
                 container_client = self.blob_service_client.get_container_client(self.container_name)
                 if not container_client.exists():
                     self.blob_service_client.create_container(self.container_name)
-                    logger.info(f"Created container: {self.container_name}")
+                    logger.info("Created container: %s", self.container_name)
             except Exception as e:
-                logger.error(f"Error creating container: {str(e)}")
+                logger.error("Error creating container: %s", e)
                 self.use_blob_storage = False
+                self._use_local_storage()
+    
+    def _use_local_storage(self):
+        """Switch to the local SQLite token database."""
+        self.storage_file = LOCAL_TOKEN_DB
+        self.connection = _get_connection(self.storage_file)
+        _import_legacy_tokens(self.connection)
     
     def get_token(self, user_id, platform, service):
         """
@@ -103,32 +278,33 @@ class TokenStorageManager:
             dict: The token record or None if not found
         """
         try:
-            if self.use_blob_storage:
-                # Get the blob
-                blob_client = self.blob_service_client.get_blob_client(
-                    container=self.container_name, 
-                    blob=self.blob_name
-                )
-                
-                if blob_client.exists():
-                    # Download the blob content
-                    blob_content = blob_client.download_blob().readall()
-                    tokens = json.loads(blob_content)
-                else:
-                    # Blob doesn't exist, create an empty dictionary
-                    tokens = {}
-            else:
-                # Use local file
-                with open(self.storage_file, 'r') as f:
-                    tokens = json.load(f)
-                
+            if not self.use_blob_storage:
+                # Look up the single row in the local database
+                with _db_lock:
+                    row = self.connection.execute(
+                        "SELECT data FROM tokens WHERE user_id = ? AND platform = ? AND service = ?",
+                        (str(user_id), platform, service)
+                    ).fetchone()
+                return orjson.loads(row[0]) if row else None
+            
             key = f"{user_id}_{platform}_{service}"
-            return tokens.get(key)
+            # Writes not yet uploaded take precedence over the blob contents
+            with self._pending_lock:
+                if key in self._pending:
+                    return self._pending[key]
+            
+            # Get the blob
+            blob_client = self.blob_service_client.get_blob_client(
+                container=self.container_name, 
+                blob=self.blob_name
+            )
+            
+            return self._read_blob_tokens(blob_client).get(key)
         except Exception as e:
-            logger.error(f"Error retrieving token: {str(e)}")
+            logger.error("Error retrieving token: %s", e)
             return None
     
-    def store_token(self, user_id, platform, service, token_data):
+    def store_token(self, user_id, platform, service, token_data, durable=False):
         """
         Store a token in storage.
         
@@ -137,96 +313,210 @@ class TokenStorageManager:
             platform (str): The platform name (e.g., "Box", "Dropbox")
             service (str): The service name (e.g., "BoxService")
             token_data (dict): The token data to store
+            durable (bool): Whether to upload a blob write before returning instead of batching it
             
         Returns:
             bool: True if successful, False otherwise
         """
         try:
             if self.use_blob_storage:
-                # Get the blob
-                blob_client = self.blob_service_client.get_blob_client(
-                    container=self.container_name, 
-                    blob=self.blob_name
-                )
-                
-                if blob_client.exists():
-                    # Download existing blob content
-                    blob_content = blob_client.download_blob().readall()
-                    tokens = json.loads(blob_content)
-                else:
-                    # Blob doesn't exist, create an empty dictionary
-                    tokens = {}
+                self._queue_blob_write(f"{user_id}_{platform}_{service}", token_data)
+                if durable and not self.flush():
+                    return False
             else:
-                # Use local file
-                with open(self.storage_file, 'r') as f:
-                    tokens = json.load(f)
+                # Insert or replace the single row in the local database
+                with _db_lock:
+                    self.connection.execute(
+                        "INSERT OR REPLACE INTO tokens (user_id, platform, service, data) VALUES (?, ?, ?, ?)",
+                        (str(user_id), platform, service, orjson.dumps(token_data).decode())
+                    )
             
-            key = f"{user_id}_{platform}_{service}"
-            tokens[key] = token_data
+            logger.info("Token stored successfully for user %s", user_id)
+            return True
+        except Exception as e:
+            logger.error("Error storing token: %s", e)
+            return False
+    
+    def delete_token(self, user_id, platform, service, durable=False):
+        """
+        Delete a token from storage.
+        
+        Args:
+            user_id (str): The user's ID
+            platform (str): The platform name (e.g., "Box", "Dropbox")
+            service (str): The service name (e.g., "BoxService")
+            durable (bool): Whether to upload a blob write before returning instead of batching it
             
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        try:
             if self.use_blob_storage:
-                # Upload the updated tokens
-                blob_client.upload_blob(json.dumps(tokens), overwrite=True)
+                self._queue_blob_write(f"{user_id}_{platform}_{service}", None)
+                if durable and not self.flush():
+                    return False
             else:
-                # Write to local file
-                with open(self.storage_file, 'w') as f:
-                    json.dump(tokens, f)
+                # Delete the single row from the local database
+                with _db_lock:
+                    self.connection.execute(
+                        "DELETE FROM tokens WHERE user_id = ? AND platform = ? AND service = ?",
+                        (str(user_id), platform, service)
+                    )
             
-            logger.info(f"Token stored successfully for user {user_id}")
+            logger.info("Token deleted successfully for user %s", user_id)
             return True
         except Exception as e:
-            logger.error(f"Error storing token: {str(e)}")
+            logger.error("Error deleting token: %s", e)
             return False
     
-    def delete_token(self, user_id, platform, service):
+    async def get_token_async(self, user_id, platform, service):
         """
-        Delete a token from storage.
+        Retrieve a token from storage without blocking the event loop.
         
         Args:
             user_id (str): The user's ID
             platform (str): The platform name (e.g., "Box", "Dropbox")
             service (str): The service name (e.g., "BoxService")
             
+        Returns:
+            dict: The token record or None if not found
+        """
+        return await asyncio.to_thread(self.get_token, user_id, platform, service)
+    
+    async def store_token_async(self, user_id, platform, service, token_data, durable=False):
+        """
+        Store a token in storage without blocking the event loop.
+        
+        Args:
+            user_id (str): The user's ID
+            platform (str): The platform name (e.g., "Box", "Dropbox")
+            service (str): The service name (e.g., "BoxService")
+            token_data (dict): The token data to store
+            durable (bool): Whether to upload a blob write before returning instead of batching it
+            
         Returns:
             bool: True if successful, False otherwise
         """
+        return await asyncio.to_thread(self.store_token, user_id, platform, service, token_data, durable)
+    
+    async def delete_token_async(self, user_id, platform, service, durable=False):
+        """
+        Delete a token from storage without blocking the event loop.
+        
+        Args:
+            user_id (str): The user's ID
+            platform (str): The platform name (e.g., "Box", "Dropbox")
+            service (str): The service name (e.g., "BoxService")
+            durable (bool): Whether to upload a blob write before returning instead of batching it
+            
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        return await asyncio.to_thread(self.delete_token, user_id, platform, service, durable)
+    
+    def _read_blob_tokens(self, blob_client):
+        """
+        Get all tokens from the blob, downloading and parsing it only if it changed since the last read.
+        
+        Args:
+            blob_client (BlobClient): Client for the token blob
+            
+        Returns:
+            dict: The tokens keyed by "{user_id}_{platform}_{service}"; must not be modified
+        """
+        etag, tokens = self._blob_cache
         try:
-            if self.use_blob_storage:
+            if etag:
+                # A single conditional request; Azure answers 304 when our copy is current
+                downloader = blob_client.download_blob(etag=etag, match_condition=MatchConditions.IfModified)
+            else:
+                downloader = blob_client.download_blob()
+            tokens = orjson.loads(downloader.readall())
+            self._blob_cache = (downloader.properties.etag, tokens)
+        except ResourceNotModifiedError:
+            pass
+        except ResourceNotFoundError:
+            # Blob doesn't exist, create an empty dictionary
+            tokens = {}
+            self._blob_cache = (None, tokens)
+        return tokens
+    
+    def _queue_blob_write(self, key, token_data):
+        """
+        Queue a blob write and schedule a flush if one is not already pending.
+        
+        Args:
+            key (str): The token key
+            token_data (dict): The token data to store, or None to delete the token
+        """
+        with self._pending_lock:
+            self._pending[key] = token_data
+            if self._flush_timer is None:
+                self._flush_timer = threading.Timer(BLOB_FLUSH_DELAY, self.flush)
+                self._flush_timer.start()
+    
+    def flush(self):
+        """
+        Upload all queued token writes to Azure Blob Storage in a single read-modify-write.
+        
+        Returns:
+            bool: True if nothing was queued or the upload succeeded, False if the writes were requeued
+        """
+        with self._flush_lock:
+            with self._pending_lock:
+                pending, self._pending = self._pending, {}
+                self._cancel_flush_timer()
+            if not pending:
+                return True
+            
+            try:
                 # Get the blob
                 blob_client = self.blob_service_client.get_blob_client(
                     container=self.container_name, 
                     blob=self.blob_name
                 )
                 
-                if blob_client.exists():
-                    # Download existing blob content
-                    blob_content = blob_client.download_blob().readall()
-                    tokens = json.loads(blob_content)
-                else:
-                    # Blob doesn't exist, nothing to delete
-                    return True
-            else:
-                # Use local file
-                with open(self.storage_file, 'r') as f:
-                    tokens = json.load(f)
-            
-            key = f"{user_id}_{platform}_{service}"
-            if key in tokens:
-                del tokens[key]
-            
-            if self.use_blob_storage:
-                # Upload the updated tokens
-                blob_client.upload_blob(json.dumps(tokens), overwrite=True)
-            else:
-                # Write to local file
-                with open(self.storage_file, 'w') as f:
-                    json.dump(tokens, f)
-            
-            logger.info(f"Token deleted successfully for user {user_id}")
-            return True
-        except Exception as e:
-            logger.error(f"Error deleting token: {str(e)}")
-            return False
+                # Copy so the cached contents only change once the upload succeeds
+                tokens = dict(self._read_blob_tokens(blob_client))
+                
+                for key, token_data in pending.items():
+                    if token_data is None:
+                        tokens.pop(key, None)
+                    else:
+                        tokens[key] = token_data
+                
+                # Upload the updated tokens; the blob is replaced as a whole, never partially written
+                result = blob_client.upload_blob(orjson.dumps(tokens), overwrite=True)
+                self._blob_cache = (result["etag"], tokens)
+                self._flush_failures = 0
+                return True
+            except Exception as e:
+                logger.error("Error flushing tokens: %s", e)
+                # Keep the writes for the next flush unless they were superseded meanwhile
+                with self._pending_lock:
+                    for key, token_data in pending.items():
+                        self._pending.setdefault(key, token_data)
+                    self._schedule_flush_retry()
+                return False
+    
+    def _cancel_flush_timer(self):
+        """Cancel the scheduled flush, if any. Must be called with _pending_lock held."""
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+    
+    def _schedule_flush_retry(self):
+        """Schedule a retry of a failed flush with exponential backoff. Must be called with _pending_lock held."""
+        self._flush_failures += 1
+        if self._flush_failures > BLOB_FLUSH_MAX_RETRIES:
+            # Stop retrying on our own; the writes stay queued and go out with the next write's flush
+            logger.error("Giving up automatic token flush retries after %s failures", self._flush_failures - 1)
+            return
+        
+        self._cancel_flush_timer()
+        delay = min(BLOB_FLUSH_MAX_RETRY_DELAY, BLOB_FLUSH_DELAY * 2 ** self._flush_failures)
+        self._flush_timer = threading.Timer(delay, self.flush)
+        self._flush_timer.start()
 
 
 def create_token_record(encrypted_token):
@@ -267,6 +557,6 @@ def load_or_generate_encryption_key(env_key_name="ENCRYPTION_KEY"):
         # Generate a new key if none exists
         encryption_key = Fernet.generate_key().decode()
         # Log a warning since we should save this key
-        logger.warning(f"No encryption key found. Generated new key. Add to .env: {env_key_name}={encryption_key}")
+        logger.warning("No encryption key found. Generated new key. Add to .env: %s=%s", env_key_name, encryption_key)
     
     return encryption_key.encode() if isinstance(encryption_key, str) else encryption_key
\ No newline at end of file
@@ -1,11 +1,14 @@
 import os
 from semantic_kernel.functions import kernel_function
 from semantic_kernel.functions.kernel_function_from_prompt import KernelFunctionFromPrompt
-from services.box_service import BoxService
+from services.box_service import get_default_box_service
 import logging
 
 logger = logging.getLogger("box_plugins")
 
+# Fields needed by actions that only pick a file by name and act on its ID
+SEARCH_FIELDS = "id,name"
+
 class BoxPlugins:
     """
     Plugins for interacting with Box cloud storage.
@@ -16,7 +19,7 @@ class BoxPlugins:
         Initialize the Box plugins with a BoxService.
         If no service is provided, a new one will be created.
         """
-        self.box_service = box_service or BoxService()
+        self.box_service = box_service or get_default_box_service()
     
     @kernel_function(
         name="create_folder",
@@ -125,7 +128,7 @@ class BoxPlugins:
             if not user_id:
                 return "Error: User ID not available. Please try again later."
             
-            search_results = await self.box_service.search_for_file(user_id, query)
+            search_results = await self.box_service.search_for_file(user_id, query, fields=SEARCH_FIELDS)
             
             if not search_results or not search_results.get('entries') or len(search_results['entries']) == 0:
                 return f"No files found matching '{query}'."
@@ -242,7 +245,7 @@ class BoxPlugins:
             if not user_id:
                 return "Error: User ID not available. Please try again later."
             
-            search_results = await self.box_service.search_for_file(user_id, query)
+            search_results = await self.box_service.search_for_file(user_id, query, fields=SEARCH_FIELDS)
             
             if not search_results or not search_results.get('entries') or len(search_results['entries']) == 0:
                 return f"No files found matching '{query}'."
@@ -295,7 +298,7 @@ class BoxPlugins:
             if not user_id:
                 return "Error: User ID not available. Please try again later."
             
-            search_results = await self.box_service.search_for_file(user_id, query)
+            search_results = await self.box_service.search_for_file(user_id, query, fields=SEARCH_FIELDS)
             
             if not search_results or not search_results.get('entries') or len(search_results['entries']) == 0:
                 return f"No files found matching '{query}'."
@@ -352,7 +355,7 @@ class BoxPlugins:
             if not user_id:
                 return "Error: User ID not available. Please try again later."
             
-            search_results = await self.box_service.search_for_file(user_id, query)
+            search_results = await self.box_service.search_for_file(user_id, query, fields=SEARCH_FIELDS)
             
             if not search_results or not search_results.get('entries') or len(search_results['entries']) == 0:
                 return f"No files found matching '{query}'."
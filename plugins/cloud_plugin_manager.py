@@ -1,6 +1,6 @@
 from semantic_kernel.kernel import Kernel
-from services.box_service import BoxService
-from services.dropbox_service import DropboxService
+from services.box_service import get_default_box_service
+from services.dropbox_service import get_default_dropbox_service
 from services.google_drive_service import GoogleDriveService
 
 from services.google_calendar_service import GoogleCalendarService
@@ -43,8 +43,8 @@ class CloudPluginManager:
             google_calendar_service: GoogleCalendarService instance or None
             gmail_service: GmailService instance or None
         """
-        self.box_service = box_service or BoxService()
-        self.dropbox_service = dropbox_service or DropboxService()
+        self.box_service = box_service or get_default_box_service()
+        self.dropbox_service = dropbox_service or get_default_dropbox_service()
         self.google_drive_service = google_drive_service or GoogleDriveService()
         self.google_calendar_service = google_calendar_service or GoogleCalendarService()
         self.gmail_service = gmail_service or GmailService()
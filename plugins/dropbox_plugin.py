@@ -1,6 +1,6 @@
 from semantic_kernel.functions import kernel_function
 from semantic_kernel.functions.kernel_function_from_prompt import KernelFunctionFromPrompt
-from services.dropbox_service import DropboxService
+from services.dropbox_service import get_default_dropbox_service
 import logging
 import os
 
@@ -16,7 +16,7 @@ class DropboxPlugins:
         Initialize the Dropbox plugins with a DropboxService.
         If no service is provided, a new one will be created.
         """
-        self.dropbox_service = dropbox_service or DropboxService()
+        self.dropbox_service = dropbox_service or get_default_dropbox_service()
     
     @kernel_function(
         name="create_folder",
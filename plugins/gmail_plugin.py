@@ -94,15 +94,17 @@ class GmailPlugins:
             if not emails or len(emails) == 0:
                 return f"No emails found matching query '{query}'."
             
+            # Get the full email messages in one batch if we only have IDs
+            stub_ids = [email['id'] for email in emails if 'id' in email and 'payload' not in email]
+            if stub_ids:
+                full_emails = await self.gmail_service.get_emails_batch(user_id, stub_ids)
+                emails_by_id = {full_email['id']: full_email for full_email in full_emails}
+                emails = [emails_by_id[email['id']] if 'id' in email and 'payload' not in email else email for email in emails]
+
             # Format the emails into a readable summary
             summary = f"**Search Results for '{query}':**\n\n"
-            
+
             for i, email in enumerate(emails, 1):
-                # Get the full email message if we only have IDs
-                if 'id' in email and not 'payload' in email:
-                    full_email = await self.gmail_service.get_email(user_id, email['id'])
-                    email = full_email
-                
                 summary += self._format_email_summary(email, i)
             
             return summary
@@ -489,11 +491,14 @@ class GmailPlugins:
         try:
             header_prefix = f"**{index}. " if index is not None else "**"
             
+            payload = email.get('payload') or {}
+            parts = payload.get('parts') or ()
+            
             # Extract headers
             headers = {}
-            if 'payload' in email and 'headers' in email['payload']:
-                for header in email['payload']['headers']:
-                    headers[header.get('name', '').lower()] = header.get('value', '')
+            for header in payload.get('headers') or ():
+                get = header.get
+                headers[get('name', '').lower()] = get('value', '')
             
             # Get subject, from, and date
             subject = headers.get('subject', 'No Subject')
@@ -507,11 +512,11 @@ class GmailPlugins:
             
             # Check for attachments
             has_attachments = False
-            if 'payload' in email and 'parts' in email['payload']:
-                for part in email['payload']['parts']:
-                    if part.get('filename') and part['filename'].strip():
-                        has_attachments = True
-                        break
+            for part in parts:
+                filename = part.get('filename')
+                if filename and filename.strip():
+                    has_attachments = True
+                    break
             
             if has_attachments:
                 summary += "   📎 Has attachments\n"
@@ -527,11 +532,13 @@ class GmailPlugins:
     def _format_email_detail(self, email):
         """Format an email into a detailed view."""
         try:
+            payload = email.get('payload') or {}
+            
             # Extract headers
             headers = {}
-            if 'payload' in email and 'headers' in email['payload']:
-                for header in email['payload']['headers']:
-                    headers[header.get('name', '').lower()] = header.get('value', '')
+            for header in payload.get('headers') or ():
+                get = header.get
+                headers[get('name', '').lower()] = get('value', '')
             
             # Get email details
             subject = headers.get('subject', 'No Subject')
@@ -550,10 +557,10 @@ class GmailPlugins:
             
             # List attachments if any
             attachments = []
-            if 'payload' in email and 'parts' in email['payload']:
-                for part in email['payload']['parts']:
-                    if part.get('filename') and part['filename'].strip():
-                        attachments.append(part['filename'])
+            for part in payload.get('parts') or ():
+                filename = part.get('filename')
+                if filename and filename.strip():
+                    attachments.append(filename)
             
             if attachments:
                 detail += "**Attachments:**\n"
@@ -579,48 +586,52 @@ class GmailPlugins:
         Extract the body content from an email message.
         """
         try:
-            if 'payload' not in email:
+            payload = email.get('payload')
+            if payload is None:
                 return "No content found in email."
             
             # If including headers in the extraction (for summarization)
             headers_text = ""
-            if include_headers and 'headers' in email['payload']:
-                key_headers = ['from', 'to', 'subject', 'date']
-                for header in email['payload']['headers']:
-                    if header.get('name', '').lower() in key_headers:
-                        headers_text += f"{header.get('name')}: {header.get('value')}\n"
+            if include_headers and 'headers' in payload:
+                key_headers = ('from', 'to', 'subject', 'date')
+                for header in payload['headers']:
+                    name = header.get('name', '')
+                    if name.lower() in key_headers:
+                        headers_text += f"{name}: {header.get('value')}\n"
                 headers_text += "\n"
             
             # Function to extract text from parts
+            b64decode = base64.urlsafe_b64decode
             def get_text_from_part(part):
-                if 'body' in part and 'data' in part['body']:
-                    data = part['body']['data']
+                data = (part.get('body') or {}).get('data')
+                if data is not None:
                     try:
-                        decoded = base64.urlsafe_b64decode(data).decode('utf-8')
-                        return decoded
+                        return b64decode(data).decode('utf-8')
                     except Exception:
                         return "[Content could not be decoded]"
                 return ""
             
             # Check if this is a multipart message
-            if 'parts' in email['payload']:
+            parts = payload.get('parts')
+            if parts is not None:
                 text_parts = []
-                for part in email['payload']['parts']:
+                append = text_parts.append
+                for part in parts:
                     mime_type = part.get('mimeType', '')
                     if mime_type == 'text/plain':
-                        text_parts.append(get_text_from_part(part))
+                        append(get_text_from_part(part))
                     elif 'parts' in part:  # Handle nested multipart
                         for subpart in part['parts']:
                             if subpart.get('mimeType', '') == 'text/plain':
-                                text_parts.append(get_text_from_part(subpart))
+                                append(get_text_from_part(subpart))
                 
                 content = "\n".join(text_parts)
                 return headers_text + (content if content else "[No plain text content found]")
             else:
                 # Handle single part message
-                mime_type = email['payload'].get('mimeType', '')
+                mime_type = payload.get('mimeType', '')
                 if mime_type == 'text/plain':
-                    content = get_text_from_part(email['payload'])
+                    content = get_text_from_part(payload)
                     return headers_text + (content if content else "[Empty message]")
                 else:
                     return headers_text + f"[Content is in {mime_type} format and cannot be displayed as text]"
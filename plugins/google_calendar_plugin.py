@@ -1,24 +1,84 @@
+import asyncio
+import functools
 import json
 import os
+import re
+import time
+from collections import defaultdict
 from datetime import datetime, timedelta
 from semantic_kernel.functions import kernel_function
-from semantic_kernel.functions.kernel_function_from_prompt import KernelFunctionFromPrompt
 from services.google_calendar_service import GoogleCalendarService
 import logging
 
 logger = logging.getLogger("google_calendar_plugins")
 
+# Google Calendar web URLs
+CALENDAR_URL = "https://calendar.google.com/calendar/u/0/r"
+EVENT_LINK_BASE_URL = "https://www.google.com/calendar/event?eid="
+
+# How long a user's calendar timezone is reused before it is fetched again (seconds)
+TIMEZONE_CACHE_TTL = 3600
+
+# Limits on what is sent to the LLM when ranking search results
+MAX_RANKED_EVENTS = 15
+MAX_RANKED_SUMMARY_CHARS = 120
+MAX_RANKED_DESCRIPTION_CHARS = 200
+
+# Maximum number of concurrent Google Calendar requests issued by bulk operations
+MAX_CONCURRENT_BULK_REQUESTS = 8
+
+# Characters that may appear in a Google Calendar event ID; besides base32hex, recurring instances
+# add suffixes like "_R20240315T160000" and imported events may carry other letters or a leading "_"
+_EVENT_ID_RE = re.compile(r'[A-Za-z0-9_]{5,1024}')
+
+# Complete RFC 3339 date-times, which the Calendar API accepts as-is
+_ISO_DATE_TIME_RE = re.compile(r'\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}(?:\.\d+)?(?:Z|[+-]\d{2}:\d{2})')
+
+# String values accepted as "true" for boolean plugin arguments
+_TRUTHY_VALUES = frozenset(("true", "1", "yes", "y", "on"))
+
+# Shared encoder for event details; keeps non-ASCII titles as-is instead of escaping them
+_EVENT_JSON_ENCODER = json.JSONEncoder(indent=2, separators=(',', ': '), ensure_ascii=False, default=str)
+
+@functools.lru_cache(maxsize=256)
+def _parse_iso_cached(value):
+    """Parse an ISO 8601 string, reusing the result for repeated inputs (datetimes are immutable)."""
+    return datetime.fromisoformat(value)
+
+def _to_rfc3339(value):
+    """Return value as an ISO 8601 date-time, passing through strings that already have an offset."""
+    if _ISO_DATE_TIME_RE.fullmatch(value):
+        return value
+    return _parse_iso_cached(value).isoformat()
+
+def _format_event_time(label, when):
+    """Format an event's start or end as a single line, or an empty string if unset."""
+    if 'dateTime' in when:
+        # Google returns RFC 3339 timestamps, so the date and local time can be sliced out directly
+        date_time = when['dateTime']
+        return f"{label}: {date_time[:10]} {date_time[11:19]}\n"
+    if 'date' in when:
+        return f"{label}: {when['date']} (All day)\n"
+    return ""
+
 class GoogleCalendarPlugins:
     """
     Plugins for interacting with Google Calendar.
     """
     
+    # Prompt function used to rank search results, created on first use
+    _rank_events_fn = None
+    
     def __init__(self, calendar_service=None):
         """
         Initialize the Google Calendar plugins with a GoogleCalendarService.
         If no service is provided, a new one will be created.
         """
         self.calendar_service = calendar_service or GoogleCalendarService()
+        
+        # Per-user timezone cache: user_id -> (fetched_at, timezone)
+        self._tz_cache = {}
+        self._tz_locks = defaultdict(asyncio.Lock)
     
     @kernel_function(
         name="create_calendar",
@@ -80,7 +140,7 @@ class GoogleCalendarPlugins:
             start_date_time: Start time (ISO 8601 - YYYY-MM-DDTHH:MM:SS±hh:mm)
             end_date_time: End time (ISO 8601 - YYYY-MM-DDTHH:MM:SS±hh:mm)
             location: Event location (optional)
-            is_all_day: Whether this is an all-day event (default: "false")
+            is_all_day: Whether this is an all-day event, e.g. "true"/"false" or a bool (default: "false")
             attendee_emails: Comma-separated list of attendee emails
             user_id: The user's ID (automatically provided)
             
@@ -91,55 +151,66 @@ class GoogleCalendarPlugins:
             if not user_id:
                 return "Error: User ID not available. Please try again later."
             
-            # Parse datetime strings and is_all_day
-            try:
-                start_dt = datetime.fromisoformat(start_date_time.replace('Z', '+00:00'))
-                end_dt = datetime.fromisoformat(end_date_time.replace('Z', '+00:00'))
-                is_all_day_event = is_all_day.lower() == "true"
-            except ValueError as e:
-                return f"Error parsing date: {str(e)}"
-            
-            # Parse attendee emails
-            attendees = []
-            if attendee_emails:
-                attendees = [{"email": email.strip()} for email in attendee_emails.split(",") if email.strip()]
+            # Start fetching the user's timezone while the input is parsed
+            timezone_task = asyncio.create_task(self._get_user_timezone(user_id))
             
-            # Fetch user's timezone
             try:
-                timezone_info = await self.calendar_service.get_user_timezone(user_id)
-                user_timezone = timezone_info.get("timezone", "UTC")
-            except Exception:
-                user_timezone = "UTC"
-            
-            # Create event dictionary
-            event = {
-                "summary": summary,
-                "description": description,
-                "location": location,
-                "start": {},
-                "end": {},
-                "attendees": attendees
-            }
+                # Parse datetime strings and is_all_day
+                try:
+                    if isinstance(is_all_day, bool):
+                        is_all_day_event = is_all_day
+                    else:
+                        is_all_day_event = is_all_day.strip().lower() in _TRUTHY_VALUES
+                    
+                    if is_all_day_event:
+                        start_value = _parse_iso_cached(start_date_time).strftime("%Y-%m-%d")
+                        end_value = _parse_iso_cached(end_date_time).strftime("%Y-%m-%d")
+                    else:
+                        start_value = _to_rfc3339(start_date_time)
+                        end_value = _to_rfc3339(end_date_time)
+                except ValueError as e:
+                    return f"Error parsing date: {str(e)}"
+                
+                # Parse attendee emails
+                attendees = []
+                if attendee_emails and not attendee_emails.isspace():
+                    attendees = [{"email": email} for part in attendee_emails.split(",") if (email := part.strip())]
+                
+                # Wait for the user's timezone
+                user_timezone = await timezone_task
+            finally:
+                # Don't leave the fetch pending when parsing fails or returns early
+                timezone_task.cancel()
             
             # Set start and end dates/times
             if is_all_day_event:
-                event["start"] = {"date": start_dt.strftime("%Y-%m-%d")}
-                event["end"] = {"date": end_dt.strftime("%Y-%m-%d")}
+                start = {"date": start_value}
+                end = {"date": end_value}
             else:
-                event["start"] = {
-                    "dateTime": start_dt.isoformat(),
+                start = {
+                    "dateTime": start_value,
                     "timeZone": user_timezone
                 }
-                event["end"] = {
-                    "dateTime": end_dt.isoformat(),
+                end = {
+                    "dateTime": end_value,
                     "timeZone": user_timezone
                 }
             
+            # Create event dictionary
+            event = {
+                "summary": summary,
+                "description": description,
+                "location": location,
+                "start": start,
+                "end": end,
+                "attendees": attendees
+            }
+            
             # Add the event
             added_event = await self.calendar_service.add_event(user_id, event)
             
             if added_event:
-                event_link = "https://calendar.google.com/calendar/u/0/r"
+                event_link = CALENDAR_URL
                 return f"Event added: {added_event.get('summary')}\nEvent link: {event_link}"
             else:
                 return "Failed to add the event."
@@ -172,36 +243,18 @@ class GoogleCalendarPlugins:
             if not user_id:
                 return "Error: User ID not available. Please try again later."
             
-            # First try to delete assuming event_id_or_query is an event ID
-            try:
-                await self.calendar_service.delete_event(user_id, event_id_or_query)
-                return f"Event deleted successfully. ID: {event_id_or_query}"
-            except Exception:
-                # If deletion fails, assume it's not an ID and proceed with search
-                pass
-            
-            # Search for events matching the query
-            search_results = await self.calendar_service.search_events(user_id, event_id_or_query)
-            events = search_results.get("items", [])
-            
-            if not events:
-                return f"No events found matching '{event_id_or_query}'."
+            calendar_service = self.calendar_service
             
-            if len(events) == 1:
-                event = events[0]
-                await self.calendar_service.delete_event(user_id, event["id"])
-                return f"Event deleted: {event.get('summary')} (ID: {event.get('id')})"
+            async def delete_by_id(event_id):
+                await calendar_service.delete_event(user_id, event_id)
+                return f"Event deleted successfully. ID: {event_id}"
             
-            # If multiple events and kernel is provided, find most relevant
-            if kernel and len(events) > 1:
-                most_relevant_event = await self._find_most_relevant_event(kernel, events, event_id_or_query)
-                
-                if most_relevant_event:
-                    await self.calendar_service.delete_event(user_id, most_relevant_event["id"])
-                    return f"Event deleted: {most_relevant_event.get('summary')} (ID: {most_relevant_event.get('id')})"
+            async def delete_match(event):
+                event_id = event["id"]
+                await calendar_service.delete_event(user_id, event_id)
+                return f"Event deleted: {event.get('summary')} (ID: {event_id})"
             
-            # If multiple events and no most relevant found, return summary
-            return "Multiple events found. Please be more specific:\n" + self._create_search_results_summary(events)
+            return await self._resolve_and_act(user_id, event_id_or_query, kernel, delete_by_id, delete_match)
                 
         except Exception as e:
             logger.error(f"Error deleting event: {str(e)}")
@@ -231,33 +284,22 @@ class GoogleCalendarPlugins:
             if not user_id:
                 return "Error: User ID not available. Please try again later."
             
-            # First try to get the event directly (in case search_query is an event ID)
-            try:
-                event = await self.calendar_service.get_event(user_id, search_query)
-                return json.dumps(event, indent=2)
-            except Exception:
-                # If getting the event fails, assume it's not an ID and proceed with search
-                pass
-            
-            # Search for events matching the query
-            search_results = await self.calendar_service.search_events(user_id, search_query)
-            events = search_results.get("items", [])
+            calendar_service = self.calendar_service
             
-            if not events:
-                return f"No events found matching '{search_query}'."
-            
-            if len(events) == 1:
-                return json.dumps(events[0], indent=2)
+            async def get_by_id(event_id):
+                return _EVENT_JSON_ENCODER.encode(await calendar_service.get_event(user_id, event_id))
             
-            # If multiple events and kernel is provided, find most relevant
-            if kernel and len(events) > 1:
-                most_relevant_event = await self._find_most_relevant_event(kernel, events, search_query)
-                
-                if most_relevant_event:
-                    return json.dumps(most_relevant_event, indent=2)
+            async def get_match(event):
+                return _EVENT_JSON_ENCODER.encode(event)
             
-            # If multiple events and no most relevant found, return summary
-            return "Multiple events found. Here's a summary:\n" + self._create_search_results_summary(events)
+            return await self._resolve_and_act(
+                user_id,
+                search_query,
+                kernel,
+                get_by_id,
+                get_match,
+                multiple_prefix="Multiple events found. Here's a summary:\n"
+            )
                 
         except Exception as e:
             logger.error(f"Error getting event: {str(e)}")
@@ -291,16 +333,12 @@ class GoogleCalendarPlugins:
             if not user_id:
                 return "Error: User ID not available. Please try again later."
             
+            # fromisoformat also accepts plain YYYY-MM-DD dates
             try:
                 start_dt = datetime.fromisoformat(start_date)
                 end_dt = datetime.fromisoformat(end_date)
-            except ValueError:
-                # Try to parse as just date
-                try:
-                    start_dt = datetime.strptime(start_date, "%Y-%m-%d")
-                    end_dt = datetime.strptime(end_date, "%Y-%m-%d")
-                except ValueError as e:
-                    return f"Error parsing date: {str(e)}"
+            except ValueError as e:
+                return f"Error parsing date: {str(e)}"
             
             events = await self.calendar_service.get_events(user_id, start_dt, end_dt, max_results)
             
@@ -347,8 +385,8 @@ class GoogleCalendarPlugins:
             
             # Parse datetime strings
             try:
-                start_dt = datetime.fromisoformat(start_date_time.replace('Z', '+00:00'))
-                end_dt = datetime.fromisoformat(end_date_time.replace('Z', '+00:00'))
+                start_value = _to_rfc3339(start_date_time)
+                end_value = _to_rfc3339(end_date_time)
             except ValueError as e:
                 return f"Error parsing date: {str(e)}"
             
@@ -357,48 +395,30 @@ class GoogleCalendarPlugins:
                 "summary": summary,
                 "description": description,
                 "start": {
-                    "dateTime": start_dt.isoformat(),
+                    "dateTime": start_value,
                     "timeZone": "UTC"  # Default to UTC
                 },
                 "end": {
-                    "dateTime": end_dt.isoformat(),
+                    "dateTime": end_value,
                     "timeZone": "UTC"  # Default to UTC
                 }
             }
             
-            # First try to update assuming event_id_or_query is an event ID
-            try:
-                result = await self.calendar_service.update_event(user_id, event_id_or_query, updated_event)
-                event_link = f"https://www.google.com/calendar/event?eid={result.get('id')}"
-                return f"Event updated: {result.get('summary')} (ID: {result.get('id')})\nEvent link: {event_link}"
-            except Exception:
-                # If update fails, assume it's not an ID and proceed with search
-                pass
+            calendar_service = self.calendar_service
             
-            # Search for events matching the query
-            search_results = await self.calendar_service.search_events(user_id, event_id_or_query)
-            events = search_results.get("items", [])
-            
-            if not events:
-                return f"No events found matching '{event_id_or_query}'."
+            async def update_by_id(event_id):
+                result = await calendar_service.update_event(user_id, event_id, updated_event)
+                result_id = result.get('id')
+                event_link = f"{EVENT_LINK_BASE_URL}{result_id}"
+                return f"Event updated: {result.get('summary')} (ID: {result_id})\nEvent link: {event_link}"
             
-            if len(events) == 1:
-                event = events[0]
-                result = await self.calendar_service.update_event(user_id, event["id"], updated_event)
-                event_link = f"https://www.google.com/calendar/event?eid={result.get('id')}"
-                return f"Event updated: {result.get('summary')} (ID: {result.get('id')})\nEvent link: {event_link}"
-            
-            # If multiple events and kernel is provided, find most relevant
-            if kernel and len(events) > 1:
-                most_relevant_event = await self._find_most_relevant_event(kernel, events, event_id_or_query)
-                
-                if most_relevant_event:
-                    result = await self.calendar_service.update_event(user_id, most_relevant_event["id"], updated_event)
-                    event_link = f"https://www.google.com/calendar/event?eid={result.get('id')}"
-                    return f"Event updated: {result.get('summary')} (ID: {result.get('id')})\nEvent link: {event_link}"
-            
-            # If multiple events and no most relevant found, return summary
-            return "Multiple events found. Please be more specific:\n" + self._create_search_results_summary(events)
+            return await self._resolve_and_act(
+                user_id,
+                event_id_or_query,
+                kernel,
+                update_by_id,
+                lambda event: update_by_id(event["id"])
+            )
                 
         except Exception as e:
             logger.error(f"Error updating event: {str(e)}")
@@ -430,43 +450,240 @@ class GoogleCalendarPlugins:
             if not user_id:
                 return "Error: User ID not available. Please try again later."
             
-            # First try to share assuming event_id_or_query is an event ID
-            try:
-                await self.calendar_service.share_event(user_id, event_id_or_query, shared_email)
-                event_link = f"https://www.google.com/calendar/event?eid={event_id_or_query}"
-                return f"Event (ID: {event_id_or_query}) successfully shared with {shared_email}.\nEvent link: {event_link}"
-            except Exception:
-                # If sharing fails, assume it's not an ID and proceed with search
-                pass
+            calendar_service = self.calendar_service
             
-            # Search for events matching the query
-            search_results = await self.calendar_service.search_events(user_id, event_id_or_query)
-            events = search_results.get("items", [])
+            async def share_by_id(event_id):
+                await calendar_service.share_event(user_id, event_id, shared_email)
+                event_link = f"{EVENT_LINK_BASE_URL}{event_id}"
+                return f"Event (ID: {event_id}) successfully shared with {shared_email}.\nEvent link: {event_link}"
             
-            if not events:
-                return f"No events found matching '{event_id_or_query}'."
+            async def share_match(event):
+                event_id = event["id"]
+                await calendar_service.share_event(user_id, event_id, shared_email)
+                event_link = f"{EVENT_LINK_BASE_URL}{event_id}"
+                return f"Event shared: {event.get('summary')} (ID: {event_id}) with {shared_email}\nEvent link: {event_link}"
             
-            if len(events) == 1:
-                event = events[0]
-                await self.calendar_service.share_event(user_id, event["id"], shared_email)
-                event_link = f"https://www.google.com/calendar/event?eid={event.get('id')}"
-                return f"Event shared: {event.get('summary')} (ID: {event.get('id')}) with {shared_email}\nEvent link: {event_link}"
+            return await self._resolve_and_act(user_id, event_id_or_query, kernel, share_by_id, share_match)
+                
+        except Exception as e:
+            logger.error(f"Error sharing event: {str(e)}")
+            return f"An error occurred while sharing the event: {str(e)}"
+    
+    @kernel_function(
+        name="delete_events",
+        description="Deletes several events from the user's Google Calendar by their IDs"
+    )
+    async def delete_events(
+        self,
+        event_ids: str,
+        user_id: str = None,
+        kernel = None
+    ) -> str:
+        """
+        Deletes several events from the user's Google Calendar by their IDs.
+        
+        Args:
+            event_ids: Comma-separated list of event IDs
+            user_id: The user's ID (automatically provided)
             
-            # If multiple events and kernel is provided, find most relevant
-            if kernel and len(events) > 1:
-                most_relevant_event = await self._find_most_relevant_event(kernel, events, event_id_or_query)
+        Returns:
+            str: Result for each event or error message
+        """
+        try:
+            if not user_id:
+                return "Error: User ID not available. Please try again later."
+            
+            calendar_service = self.calendar_service
+            
+            async def delete_one(event_id):
+                await calendar_service.delete_event(user_id, event_id)
+                return f"Event deleted successfully. ID: {event_id}"
+            
+            return await self._run_bulk(event_ids, delete_one)
                 
-                if most_relevant_event:
-                    await self.calendar_service.share_event(user_id, most_relevant_event["id"], shared_email)
-                    event_link = f"https://www.google.com/calendar/event?eid={most_relevant_event.get('id')}"
-                    return f"Event shared: {most_relevant_event.get('summary')} (ID: {most_relevant_event.get('id')}) with {shared_email}\nEvent link: {event_link}"
+        except Exception as e:
+            logger.error(f"Error deleting events: {str(e)}")
+            return f"An error occurred while deleting the events: {str(e)}"
+    
+    @kernel_function(
+        name="share_events",
+        description="Shares several events with another user by adding them as an attendee"
+    )
+    async def share_events(
+        self,
+        event_ids: str,
+        shared_email: str,
+        user_id: str = None,
+        kernel = None
+    ) -> str:
+        """
+        Shares several events with another user by adding them as an attendee.
+        
+        Args:
+            event_ids: Comma-separated list of event IDs
+            shared_email: Email of the user to share with
+            user_id: The user's ID (automatically provided)
             
-            # If multiple events and no most relevant found, return summary
-            return "Multiple events found. Please be more specific:\n" + self._create_search_results_summary(events)
+        Returns:
+            str: Result for each event or error message
+        """
+        try:
+            if not user_id:
+                return "Error: User ID not available. Please try again later."
+            
+            calendar_service = self.calendar_service
+            
+            async def share_one(event_id):
+                await calendar_service.share_event(user_id, event_id, shared_email)
+                return f"Event (ID: {event_id}) successfully shared with {shared_email}."
+            
+            return await self._run_bulk(event_ids, share_one)
                 
         except Exception as e:
-            logger.error(f"Error sharing event: {str(e)}")
-            return f"An error occurred while sharing the event: {str(e)}"
+            logger.error(f"Error sharing events: {str(e)}")
+            return f"An error occurred while sharing the events: {str(e)}"
+    
+    async def _run_bulk(self, event_ids, action):
+        """
+        Run an action concurrently for each event ID in a comma-separated list.
+        
+        Args:
+            event_ids: Comma-separated list of event IDs
+            action: Async callable taking an event ID and returning a result message
+            
+        Returns:
+            str: One result line per event ID, in input order
+        """
+        ids = [event_id for part in event_ids.split(",") if (event_id := part.strip())]
+        if not ids:
+            return "Error: No event IDs provided."
+        
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_BULK_REQUESTS)
+        
+        async def run_one(event_id):
+            async with semaphore:
+                try:
+                    return await action(event_id)
+                except Exception as e:
+                    # Report the failure without cancelling the other requests
+                    return f"Failed for event ID {event_id}: {str(e)}"
+        
+        async with asyncio.TaskGroup() as tg:
+            tasks = [tg.create_task(run_one(event_id)) for event_id in ids]
+        
+        return "\n".join(task.result() for task in tasks)
+    
+    async def _resolve_and_act(
+        self,
+        user_id,
+        event_id_or_query,
+        kernel,
+        id_action,
+        match_action,
+        multiple_prefix="Multiple events found. Please be more specific:\n"
+    ):
+        """
+        Resolve an event ID or search query to a single event and act on it.
+        
+        The input is first tried as an event ID. Otherwise the search results are used:
+        a single match is acted on directly, and multiple matches are ranked with the
+        kernel when one is available.
+        
+        Args:
+            user_id: The user's ID
+            event_id_or_query: Event ID or search query
+            kernel: Semantic Kernel instance used to rank multiple matches (optional)
+            id_action: Async callable taking an event ID and returning the response message
+            match_action: Async callable taking a matched event and returning the response message
+            multiple_prefix: Message prefix used when no single event could be chosen
+            
+        Returns:
+            str: The response message
+        """
+        result, events = await self._try_id_or_search(user_id, event_id_or_query, id_action)
+        if events is None:
+            return result
+        
+        if not events:
+            return f"No events found matching '{event_id_or_query}'."
+        
+        if len(events) == 1:
+            return await match_action(events[0])
+        
+        # If multiple events and kernel is provided, find most relevant
+        if kernel:
+            most_relevant_event = await self._find_most_relevant_event(kernel, events, event_id_or_query)
+            
+            if most_relevant_event:
+                return await match_action(most_relevant_event)
+        
+        # If multiple events and no most relevant found, return summary
+        return multiple_prefix + self._create_search_results_summary(events)
+    
+    async def _try_id_or_search(self, user_id, event_id_or_query, id_action):
+        """
+        Run an action assuming the input is an event ID, while searching for it
+        as a query in parallel so a failed ID attempt doesn't cost a second round-trip.
+        
+        Args:
+            user_id: The user's ID
+            event_id_or_query: Event ID or search query
+            id_action: Async callable taking an event ID
+            
+        Returns:
+            tuple: (action result, None) if the ID action succeeded,
+                otherwise (None, list of events matching the query)
+        """
+        # Inputs that can't be event IDs go straight to the search
+        if not _EVENT_ID_RE.fullmatch(event_id_or_query):
+            search_results = await self.calendar_service.search_events(user_id, event_id_or_query)
+            return None, search_results.get("items", [])
+        
+        search_task = asyncio.create_task(
+            self.calendar_service.search_events(user_id, event_id_or_query)
+        )
+        
+        try:
+            result = await id_action(event_id_or_query)
+        except Exception:
+            # The action failed, so assume it's not an ID and use the search results
+            search_results = await search_task
+            return None, search_results.get("items", [])
+        
+        # The input was an ID; the search results are not needed
+        search_task.cancel()
+        search_task.add_done_callback(lambda task: task.cancelled() or task.exception())
+        return result, None
+    
+    async def _get_user_timezone(self, user_id):
+        """
+        Get the user's calendar timezone, reusing a recently fetched value.
+        
+        Args:
+            user_id: The user's ID
+            
+        Returns:
+            str: The user's timezone, or "UTC" if it could not be fetched
+        """
+        cached = self._tz_cache.get(user_id)
+        if cached and time.monotonic() - cached[0] < TIMEZONE_CACHE_TTL:
+            return cached[1]
+        
+        async with self._tz_locks[user_id]:
+            # Another call may have fetched the timezone while we waited
+            cached = self._tz_cache.get(user_id)
+            if cached and time.monotonic() - cached[0] < TIMEZONE_CACHE_TTL:
+                return cached[1]
+            
+            try:
+                timezone_info = await self.calendar_service.get_user_timezone(user_id)
+                user_timezone = timezone_info.get("timezone", "UTC")
+            except Exception:
+                # Don't cache the fallback so the next call retries the lookup
+                return "UTC"
+            
+            self._tz_cache[user_id] = (time.monotonic(), user_timezone)
+            return user_timezone
     
     async def _find_most_relevant_event(self, kernel, events, user_query):
         """
@@ -481,20 +698,34 @@ class GoogleCalendarPlugins:
             dict: The most relevant event or None
         """
         try:
-            # Create a function from prompt
-            rank_events_function = KernelFunctionFromPrompt(
-                function_name="RankEventsByRelevance",
-                plugin_name=None,
-                prompt="Given the user query: '{{$userQuery}}' and a list of event summaries and descriptions, "
-                    "rank them by relevance and return the index of the most relevant event. "
-                    "Do not add any comments or explanation to the response.\n"
-                    "Event list: {{$eventList}}",
-                template_format="semantic-kernel"
-            )
+            # Create the function from prompt once and share it between instances
+            cls = type(self)
+            if cls._rank_events_fn is None:
+                # Imported here since ranking is rarely needed and the import is slow
+                from semantic_kernel.functions.kernel_function_from_prompt import KernelFunctionFromPrompt
+                cls._rank_events_fn = KernelFunctionFromPrompt(
+                    function_name="RankEventsByRelevance",
+                    plugin_name=None,
+                    prompt="Given the user query: '{{$userQuery}}' and a list of event summaries and descriptions, "
+                        "rank them by relevance and return the index of the most relevant event. "
+                        "Do not add any comments or explanation to the response.\n"
+                        "Event list: {{$eventList}}",
+                    template_format="semantic-kernel"
+                )
+            rank_events_function = cls._rank_events_fn
+            
+            # Only rank the first results, with long text truncated to keep the prompt small
+            events = events[:MAX_RANKED_EVENTS]
             
             # Create event list string
-            event_list = "\n".join([f"{i}: Summary: {event.get('summary', 'No title')}, Description: {event.get('description', 'No description')}"
-                                    for i, event in enumerate(events)])
+            event_lines = []
+            append = event_lines.append
+            for i, event in enumerate(events):
+                get = event.get
+                summary = (get('summary') or 'No title')[:MAX_RANKED_SUMMARY_CHARS]
+                description = (get('description') or 'No description')[:MAX_RANKED_DESCRIPTION_CHARS]
+                append(f"{i}: Summary: {summary}, Description: {description}")
+            event_list = "\n".join(event_lines)
             
             # Create kernel arguments
             kernel_arguments = {
@@ -536,34 +767,18 @@ class GoogleCalendarPlugins:
             return "No events found."
         
         formatted_events = []
+        append = formatted_events.append
         for event in events:
-            formatted_event = f"Event: {event.get('summary', 'No title')}\n"
-            
-            # Format start time
-            start = event.get('start', {})
-            if 'dateTime' in start:
-                start_time = datetime.fromisoformat(start['dateTime'].replace('Z', '+00:00'))
-                formatted_event += f"Start: {start_time.strftime('%Y-%m-%d %H:%M:%S')}\n"
-            elif 'date' in start:
-                formatted_event += f"Start: {start['date']} (All day)\n"
-            
-            # Format end time
-            end = event.get('end', {})
-            if 'dateTime' in end:
-                end_time = datetime.fromisoformat(end['dateTime'].replace('Z', '+00:00'))
-                formatted_event += f"End: {end_time.strftime('%Y-%m-%d %H:%M:%S')}\n"
-            elif 'date' in end:
-                formatted_event += f"End: {end['date']} (All day)\n"
-            
-            # Add location if available
-            if 'location' in event and event['location']:
-                formatted_event += f"Location: {event['location']}\n"
-            
-            # Add description if available
-            if 'description' in event and event['description']:
-                formatted_event += f"Description: {event['description']}\n"
-            
-            formatted_events.append(formatted_event)
+            get = event.get
+            location = get('location')
+            description = get('description')
+            append(
+                f"Event: {get('summary', 'No title')}\n"
+                f"{_format_event_time('Start', get('start', {}))}"
+                f"{_format_event_time('End', get('end', {}))}"
+                + (f"Location: {location}\n" if location else "")
+                + (f"Description: {description}\n" if description else "")
+            )
         
         return "\n".join(formatted_events)
     
@@ -573,30 +788,16 @@ class GoogleCalendarPlugins:
             return "No events found."
         
         summary = []
+        append = summary.append
         for event in events:
-            event_summary = f"ID: {event.get('id')}\n"
-            event_summary += f"Summary: {event.get('summary', 'No title')}\n"
-            
-            # Format start time
-            start = event.get('start', {})
-            if 'dateTime' in start:
-                start_time = datetime.fromisoformat(start['dateTime'].replace('Z', '+00:00'))
-                event_summary += f"Start: {start_time.strftime('%Y-%m-%d %H:%M:%S')}\n"
-            elif 'date' in start:
-                event_summary += f"Start: {start['date']} (All day)\n"
-            
-            # Format end time
-            end = event.get('end', {})
-            if 'dateTime' in end:
-                end_time = datetime.fromisoformat(end['dateTime'].replace('Z', '+00:00'))
-                event_summary += f"End: {end_time.strftime('%Y-%m-%d %H:%M:%S')}\n"
-            elif 'date' in end:
-                event_summary += f"End: {end['date']} (All day)\n"
-            
-            # Add event link
-            event_link = f"https://www.google.com/calendar/event?eid={event.get('id')}"
-            event_summary += f"Link: {event_link}\n"
-            
-            summary.append(event_summary)
+            get = event.get
+            event_id = get('id')
+            append(
+                f"ID: {event_id}\n"
+                f"Summary: {get('summary', 'No title')}\n"
+                f"{_format_event_time('Start', get('start', {}))}"
+                f"{_format_event_time('End', get('end', {}))}"
+                f"Link: {EVENT_LINK_BASE_URL}{event_id}\n"
+            )
         
         return "\n".join(summary)
@@ -1,5 +1,9 @@
-import json
+import asyncio
 import os
+import re
+import time
+from collections import OrderedDict, defaultdict
+from itertools import islice
 from semantic_kernel.functions import kernel_function
 from semantic_kernel.functions.kernel_function_from_prompt import KernelFunctionFromPrompt
 from services.google_drive_service import GoogleDriveService
@@ -7,17 +11,53 @@ import logging
 
 logger = logging.getLogger("google_drive_plugins")
 
+# Number of top search results whose details are fetched while the LLM ranks the results
+SPECULATIVE_FETCH_COUNT = 5
+
+# How long search results and file details are reused across plugin calls, in seconds
+DRIVE_CACHE_TTL = 60
+DRIVE_CACHE_MAX_ENTRIES = 1024
+
+# Maximum number of Drive requests in flight per user, to stay under Google's rate limits
+MAX_CONCURRENT_DRIVE_REQUESTS = 8
+
+# Sharing roles supported by Google Drive
+_VALID_ROLES = frozenset(("reader", "writer", "commenter"))
+_VALID_ROLES_STR = "reader, writer, commenter"
+
+# First integer in the ranking model's response, which may include extra text like "Index: 3"
+_INT_RE = re.compile(r"-?\d+")
+
 class GoogleDrivePlugins:
     """
     Plugins for interacting with Google Drive cloud storage.
     """
     
+    # Prompt function used to rank search results, created on first use
+    _rank_files_fn = None
+    
     def __init__(self, drive_service=None):
         """
         Initialize the Google Drive plugins with a GoogleDriveService.
-        If no service is provided, a new one will be created.
+        If no service is provided, a new one will be created when first needed.
         """
-        self.drive_service = drive_service or GoogleDriveService()
+        self._drive_service = drive_service
+        
+        # Cache of recent search results and file details: key -> (fetched_at, result)
+        self._cache = OrderedDict()
+        self._cache_locks = defaultdict(asyncio.Lock)
+        # Per-user request limits while the user has calls in flight: user_id -> [semaphore, callers]
+        self._user_semaphores = {}
+        
+        # Create temp directory if it doesn't exist
+        os.makedirs("temp", exist_ok=True)
+    
+    @property
+    def drive_service(self):
+        """The GoogleDriveService used by the plugins, created on first access if none was provided."""
+        if self._drive_service is None:
+            self._drive_service = GoogleDriveService()
+        return self._drive_service
     
     @kernel_function(
         name="create_folder",
@@ -45,7 +85,8 @@ class GoogleDrivePlugins:
             if not user_id:
                 return "Error: User ID not available. Please try again later."
             
-            folder = await self.drive_service.create_folder(user_id, folder_name, parent_folder_id)
+            folder = await self._drive_call(self.drive_service.create_folder, user_id, folder_name, parent_folder_id)
+            self._invalidate_cache(user_id)
             
             if folder:
                 return f"Folder '{folder_name}' created successfully with ID: {folder['id']}"
@@ -78,13 +119,16 @@ class GoogleDrivePlugins:
         """
         try:
             # Get user_id from kernel.data instead of function parameter
-            if not user_id and kernel and hasattr(kernel, 'arguments'):
-                user_id = kernel.arguments.get("user_id")
+            if not user_id and kernel is not None:
+                try:
+                    user_id = kernel.arguments.get("user_id")
+                except AttributeError:
+                    pass
             
             if not user_id:
                 return "Error: User ID not available. Please try again later."
             
-            files = await self.drive_service.search_files(user_id, query)
+            files = await self._cached_search(user_id, query)
             
             if not files or len(files) == 0:
                 return f"No files found matching '{query}'."
@@ -124,27 +168,13 @@ class GoogleDrivePlugins:
             if not user_id:
                 return "Error: User ID not available. Please try again later."
             
-            files = await self.drive_service.search_files(user_id, query)
-            
-            if not files or len(files) == 0:
-                return f"No files found matching '{query}'."
-            
-            if len(files) == 1:
-                file = files[0]
-                await self.drive_service.delete_file(user_id, file['id'])
-                return f"File '{file['name']}' has been successfully deleted."
-            
-            # If multiple files and kernel is provided, find most relevant
-            if kernel and len(files) > 1:
-                most_relevant_file = await self._find_most_relevant_file(kernel, files, query)
-                
-                if most_relevant_file:
-                    await self.drive_service.delete_file(user_id, most_relevant_file['id'])
-                    return f"File '{most_relevant_file['name']}' has been successfully deleted."
+            file, message = await self._resolve_target_file(user_id, query, kernel)
+            if message:
+                return message
             
-            # If multiple files and no most relevant found, return summary
-            return f"Multiple files found matching '{query}'. Please be more specific:\n" + \
-                   "\n".join([f"- {file['name']}" for file in files[:5]])
+            await self._drive_call(self.drive_service.delete_file, user_id, file['id'])
+            self._invalidate_cache(user_id)
+            return f"File '{file['name']}' has been successfully deleted."
                 
         except Exception as e:
             logger.error(f"Error deleting file: {str(e)}")
@@ -178,28 +208,26 @@ class GoogleDrivePlugins:
             if not user_id:
                 return "Error: User ID not available. Please try again later."
             
-            # Create temp directory if it doesn't exist
-            if not os.path.exists("temp"):
-                os.makedirs("temp")
-            
             # If no file name provided, use the original name from URL
             if not file_name and file_url:
                 file_name = os.path.basename(file_url)
             
             # Handle the case where file is already downloaded
-            if os.path.exists(file_url):
+            if await asyncio.to_thread(os.path.exists, file_url):
                 local_file_path = file_url
             else:
                 # Could add code here to download from a URL if needed
                 return "Error: File not found. Please attach a file directly to your message."
             
             # Upload to Google Drive
-            file_info = await self.drive_service.upload_file(
+            file_info = await self._drive_call(
+                self.drive_service.upload_file,
                 user_id, 
                 local_file_path, 
                 file_name, 
                 parent_folder_id
             )
+            self._invalidate_cache(user_id)
             
             # Create a response with file details
             if file_info and 'id' in file_info:
@@ -247,54 +275,25 @@ class GoogleDrivePlugins:
                 return "Error: User ID not available. Please try again later."
             
             logger.info(f"Searching for files matching '{query}'")
-            files = await self.drive_service.search_files(user_id, query)
-            
-            logger.info(f"Found {len(files) if files else 0} files matching '{query}'")
-            
-            if not files or len(files) == 0:
-                return f"No files found matching '{query}'."
-            
-            if len(files) == 1:
-                file = files[0]
-                logger.info(f"Found single file: {file.get('name', 'Unknown')}, ID: {file.get('id', 'Unknown')}")
-                
-                logger.info(f"Getting file details for ID: {file['id']}")
-                file_info = await self.drive_service.get_file(user_id, file['id'])
-                
-                logger.info(f"File details: {json.dumps(file_info, indent=2)}")
-                
-                if 'webContentLink' in file_info and file_info['webContentLink']:
-                    logger.info(f"Found download link: {file_info['webContentLink']}")
-                    return f"Download link for file '{file['name']}':\n{file_info['webContentLink']}"
-                elif 'webViewLink' in file_info and file_info['webViewLink']:
-                    logger.info(f"No download link found, using view link: {file_info['webViewLink']}")
-                    return f"No direct download link available for '{file['name']}'. You can access it via this view link instead:\n{file_info['webViewLink']}"
-                else:
-                    logger.warning(f"No links found for file: {file['name']}")
-                    return f"No direct links available for '{file['name']}'. You may need to access it via the Google Drive web interface."
-            
-            # If multiple files and kernel is provided, find most relevant
-            if kernel and len(files) > 1:
-                logger.info(f"Multiple files found, attempting to find most relevant")
-                most_relevant_file = await self._find_most_relevant_file(kernel, files, query)
-                
-                if most_relevant_file:
-                    logger.info(f"Most relevant file: {most_relevant_file.get('name', 'Unknown')}")
-                    
-                    file_info = await self.drive_service.get_file(user_id, most_relevant_file['id'])
-                    logger.info(f"File details for most relevant: {json.dumps(file_info, indent=2)}")
-                    
-                    if 'webContentLink' in file_info and file_info['webContentLink']:
-                        return f"Download link for file '{most_relevant_file['name']}':\n{file_info['webContentLink']}"
-                    elif 'webViewLink' in file_info and file_info['webViewLink']:
-                        return f"No direct download link available for '{most_relevant_file['name']}'. You can access it via this view link instead:\n{file_info['webViewLink']}"
-                    else:
-                        return f"No direct links available for '{most_relevant_file['name']}'."
-            
-            # If multiple files and no most relevant found, return summary
-            file_list = "\n".join([f"- {file['name']}" for file in files[:5]])
-            logger.info(f"Returning list of multiple files: {file_list}")
-            return f"Multiple files found matching '{query}'. Please be more specific:\n{file_list}"
+            file, message = await self._resolve_target_file(user_id, query, kernel, fetch_details=True)
+            if message:
+                return message
+            
+            logger.info(f"Found file: {file.get('name', 'Unknown')}, ID: {file.get('id', 'Unknown')}")
+            file_info = await self._cached_get_file(user_id, file['id'])
+            
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("File details: %s", file_info)
+            
+            if 'webContentLink' in file_info and file_info['webContentLink']:
+                logger.info(f"Found download link: {file_info['webContentLink']}")
+                return f"Download link for file '{file['name']}':\n{file_info['webContentLink']}"
+            elif 'webViewLink' in file_info and file_info['webViewLink']:
+                logger.info(f"No download link found, using view link: {file_info['webViewLink']}")
+                return f"No direct download link available for '{file['name']}'. You can access it via this view link instead:\n{file_info['webViewLink']}"
+            else:
+                logger.warning(f"No links found for file: {file['name']}")
+                return f"No direct links available for '{file['name']}'. You may need to access it via the Google Drive web interface."
                 
         except Exception as e:
             logger.error(f"Error getting download link: {str(e)}", exc_info=True)
@@ -325,35 +324,16 @@ class GoogleDrivePlugins:
             if not user_id:
                 return "Error: User ID not available. Please try again later."
             
-            files = await self.drive_service.search_files(user_id, query)
-            
-            if not files or len(files) == 0:
-                return f"No files found matching '{query}'."
+            file, message = await self._resolve_target_file(user_id, query, kernel, fetch_details=True)
+            if message:
+                return message
             
-            if len(files) == 1:
-                file = files[0]
-                file_info = await self.drive_service.get_file(user_id, file['id'])
-                
-                if 'webViewLink' in file_info and file_info['webViewLink']:
-                    return f"View link for file '{file['name']}':\n{file_info['webViewLink']}"
-                else:
-                    return f"No view link available for '{file['name']}'."
+            file_info = await self._cached_get_file(user_id, file['id'])
             
-            # If multiple files and kernel is provided, find most relevant
-            if kernel and len(files) > 1:
-                most_relevant_file = await self._find_most_relevant_file(kernel, files, query)
-                
-                if most_relevant_file:
-                    file_info = await self.drive_service.get_file(user_id, most_relevant_file['id'])
-                    
-                    if 'webViewLink' in file_info and file_info['webViewLink']:
-                        return f"View link for file '{most_relevant_file['name']}':\n{file_info['webViewLink']}"
-                    else:
-                        return f"No view link available for '{most_relevant_file['name']}'."
-            
-            # If multiple files and no most relevant found, return summary
-            return f"Multiple files found matching '{query}'. Please be more specific:\n" + \
-                   "\n".join([f"- {file['name']}" for file in files[:5]])
+            if 'webViewLink' in file_info and file_info['webViewLink']:
+                return f"View link for file '{file['name']}':\n{file_info['webViewLink']}"
+            else:
+                return f"No view link available for '{file['name']}'."
                 
         except Exception as e:
             logger.error(f"Error getting view link: {str(e)}")
@@ -389,39 +369,19 @@ class GoogleDrivePlugins:
                 return "Error: User ID not available. Please try again later."
             
             # Validate role (Google Drive uses reader, writer, commenter)
-            valid_roles = ["reader", "writer", "commenter"]
-            if role not in valid_roles:
-                return f"Invalid role '{role}'. Valid roles are: {', '.join(valid_roles)}"
+            if role not in _VALID_ROLES:
+                return f"Invalid role '{role}'. Valid roles are: {_VALID_ROLES_STR}"
             
-            files = await self.drive_service.search_files(user_id, query)
+            file, message = await self._resolve_target_file(user_id, query, kernel, fetch_details=True)
+            if message:
+                return message
             
-            if not files or len(files) == 0:
-                return f"No files found matching '{query}'."
+            await self._drive_call(self.drive_service.share_file, user_id, file['id'], email, role)
             
-            if len(files) == 1:
-                file = files[0]
-                await self.drive_service.share_file(user_id, file['id'], email, role)
-                
-                file_info = await self.drive_service.get_file(user_id, file['id'])
-                view_link = file_info.get('webViewLink', 'No view link available')
-                
-                return f"File '{file['name']}' has been shared with {email} as a {role}. They can access the file at: {view_link}"
+            file_info = await self._cached_get_file(user_id, file['id'])
+            view_link = file_info.get('webViewLink', 'No view link available')
             
-            # If multiple files and kernel is provided, find most relevant
-            if kernel and len(files) > 1:
-                most_relevant_file = await self._find_most_relevant_file(kernel, files, query)
-                
-                if most_relevant_file:
-                    await self.drive_service.share_file(user_id, most_relevant_file['id'], email, role)
-                    
-                    file_info = await self.drive_service.get_file(user_id, most_relevant_file['id'])
-                    view_link = file_info.get('webViewLink', 'No view link available')
-                    
-                    return f"File '{most_relevant_file['name']}' has been shared with {email} as a {role}. They can access the file at: {view_link}"
-            
-            # If multiple files and no most relevant found, return summary
-            return f"Multiple files found matching '{query}'. Please be more specific:\n" + \
-                   "\n".join([f"- {file['name']}" for file in files[:5]])
+            return f"File '{file['name']}' has been shared with {email} as a {role}. They can access the file at: {view_link}"
                 
         except Exception as e:
             logger.error(f"Error sharing file: {str(e)}")
@@ -454,31 +414,159 @@ class GoogleDrivePlugins:
             if not user_id:
                 return "Error: User ID not available. Please try again later."
             
-            files = await self.drive_service.search_files(user_id, query)
+            file, message = await self._resolve_target_file(user_id, query, kernel)
+            if message:
+                return message
             
-            if not files or len(files) == 0:
-                return f"No files found matching '{query}'."
+            await self._drive_call(self.drive_service.move_file, user_id, file['id'], destination_folder_id)
+            self._invalidate_cache(user_id)
+            return f"File '{file['name']}' has been successfully moved to the destination folder."
+                
+        except Exception as e:
+            logger.error(f"Error moving file: {str(e)}")
+            return f"An error occurred while moving the file: {str(e)}"
+    
+    async def _drive_call(self, method, user_id, *args):
+        """
+        Call a Drive service method, limiting how many requests run at once for a user.
+        
+        Args:
+            method: The GoogleDriveService method to call
+            user_id: The user's ID
+            *args: Remaining arguments for the method
             
-            if len(files) == 1:
-                file = files[0]
-                await self.drive_service.move_file(user_id, file['id'], destination_folder_id)
-                return f"File '{file['name']}' has been successfully moved to the destination folder."
+        Returns:
+            The method's result
+        """
+        entry = self._user_semaphores.get(user_id)
+        if entry is None:
+            entry = self._user_semaphores[user_id] = [asyncio.Semaphore(MAX_CONCURRENT_DRIVE_REQUESTS), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                return await method(user_id, *args)
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                # Nobody is running or waiting, so the next call can start from a fresh semaphore
+                del self._user_semaphores[user_id]
+    
+    async def _cached_search(self, user_id, query):
+        """Search the user's files, reusing recent results for the same query."""
+        return await self._cached(("search", user_id, query), lambda: self._drive_call(self.drive_service.search_files, user_id, query))
+    
+    async def _cached_get_file(self, user_id, file_id):
+        """Get a file's details, reusing recently fetched details for the same file."""
+        return await self._cached(("file", user_id, file_id), lambda: self._drive_call(self.drive_service.get_file, user_id, file_id))
+    
+    async def _cached(self, key, fetch):
+        """
+        Return a cached Drive result, fetching and storing it if missing or expired.
+        
+        Args:
+            key: Cache key of the form (kind, user_id, argument)
+            fetch: Callable returning an awaitable that produces the result
+            
+        Returns:
+            The cached or freshly fetched result
+        """
+        result = self._cache_get(key)
+        if result is not None:
+            return result
+        
+        async with self._cache_locks[key]:
+            # Another call may have fetched the result while we waited
+            result = self._cache_get(key)
+            if result is not None:
+                return result
+            
+            try:
+                result = await fetch()
+            except Exception:
+                # Nothing was cached, so nothing will evict the lock later
+                self._cache_locks.pop(key, None)
+                raise
+            self._cache_put(key, result)
+        
+        return result
+    
+    def _cache_get(self, key):
+        """Return a cached result if it has not expired, otherwise None."""
+        entry = self._cache.get(key)
+        if entry and time.monotonic() - entry[0] < DRIVE_CACHE_TTL:
+            self._cache.move_to_end(key)
+            return entry[1]
+        return None
+    
+    def _cache_put(self, key, result):
+        """Store a result in the cache, evicting the least recently used entry if it is full."""
+        self._cache[key] = (time.monotonic(), result)
+        self._cache.move_to_end(key)
+        if len(self._cache) > DRIVE_CACHE_MAX_ENTRIES:
+            evicted, _ = self._cache.popitem(last=False)
+            self._cache_locks.pop(evicted, None)
+    
+    def _invalidate_cache(self, user_id):
+        """Drop all cached search results and file details for a user after a change to their Drive."""
+        for key in [key for key in self._cache if key[1] == user_id]:
+            del self._cache[key]
+            self._cache_locks.pop(key, None)
+    
+    async def _resolve_target_file(self, user_id, query, kernel, fetch_details=False):
+        """
+        Search for the single file a query refers to.
+        
+        Args:
+            user_id: The user's ID
+            query: Search query or file name
+            kernel: Semantic Kernel instance for finding most relevant file
+            fetch_details: Whether to prefetch details of the top results while ranking them
             
-            # If multiple files and kernel is provided, find most relevant
-            if kernel and len(files) > 1:
+        Returns:
+            tuple: (file, None) if a file was found, otherwise (None, message for the user)
+        """
+        files = await self._cached_search(user_id, query)
+        
+        if not files:
+            return None, f"No files found matching '{query}'."
+        
+        if len(files) == 1:
+            return files[0], None
+        
+        # If multiple files and kernel is provided, find most relevant
+        if kernel:
+            if fetch_details:
+                # Rank the files while fetching details for the top results into the cache
+                most_relevant_file, _ = await asyncio.gather(
+                    self._find_most_relevant_file(kernel, files, query),
+                    self._prefetch_files(user_id, [file['id'] for file in files[:SPECULATIVE_FETCH_COUNT]])
+                )
+            else:
                 most_relevant_file = await self._find_most_relevant_file(kernel, files, query)
-                
-                if most_relevant_file:
-                    await self.drive_service.move_file(user_id, most_relevant_file['id'], destination_folder_id)
-                    return f"File '{most_relevant_file['name']}' has been successfully moved to the destination folder."
             
-            # If multiple files and no most relevant found, return summary
-            return f"Multiple files found matching '{query}'. Please be more specific:\n" + \
-                   "\n".join([f"- {file['name']}" for file in files[:5]])
-                
+            if most_relevant_file:
+                return most_relevant_file, None
+        
+        # If multiple files and no most relevant found, return summary
+        return None, self._format_too_many_files(query, files)
+    
+    async def _prefetch_files(self, user_id, file_ids):
+        """
+        Fetch details for several files into the cache with one batch request.
+        
+        Args:
+            user_id: The user's ID
+            file_ids: IDs of the files
+        """
+        missing = [file_id for file_id in file_ids if self._cache_get(("file", user_id, file_id)) is None]
+        if not missing:
+            return
+        
+        try:
+            for file_info in await self._drive_call(self.drive_service.get_files_batch, user_id, missing):
+                self._cache_put(("file", user_id, file_info['id']), file_info)
         except Exception as e:
-            logger.error(f"Error moving file: {str(e)}")
-            return f"An error occurred while moving the file: {str(e)}"
+            logger.warning(f"Could not prefetch file details: {str(e)}")
     
     async def _find_most_relevant_file(self, kernel, files, user_query):
         """
@@ -493,19 +581,22 @@ class GoogleDrivePlugins:
             dict: The most relevant file or None
         """
         try:
-            # Create a function from prompt
-            rank_files_function = KernelFunctionFromPrompt(
-                function_name="RankFilesByRelevance",
-                plugin_name=None,
-                prompt="Given the user query: '{{$userQuery}}' and a list of file names, "
-                    "rank them by relevance and return the index of the most relevant file. "
-                    "Do not add any comments or explanation to the response.\n"
-                    "File list: {{$fileList}}",
-                template_format="semantic-kernel"
-            )
+            # Create the function from prompt once and share it between instances
+            cls = type(self)
+            if cls._rank_files_fn is None:
+                cls._rank_files_fn = KernelFunctionFromPrompt(
+                    function_name="RankFilesByRelevance",
+                    plugin_name=None,
+                    prompt="Given the user query: '{{$userQuery}}' and a list of file names, "
+                        "rank them by relevance and return the index of the most relevant file. "
+                        "Do not add any comments or explanation to the response.\n"
+                        "File list: {{$fileList}}",
+                    template_format="semantic-kernel"
+                )
+            rank_files_function = cls._rank_files_fn
             
             # Create file list string
-            file_list = "\n".join([f"{i}: Name: {file['name']}" for i, file in enumerate(files)])
+            file_list = "\n".join(f"{i}: Name: {file['name']}" for i, file in enumerate(files))
             
             # Create kernel arguments
             kernel_arguments = {
@@ -528,11 +619,12 @@ class GoogleDrivePlugins:
                 # Fallback
                 result_text = str(result_value).strip()
 
-            try:
-                most_relevant_index = int(result_text)
+            match = _INT_RE.search(result_text)
+            if match:
+                most_relevant_index = int(match.group())
                 if 0 <= most_relevant_index < len(files):
                     return files[most_relevant_index]
-            except ValueError:
+            else:
                 logger.warning(f"Could not parse the relevance index from AI result: {result_text}")
             
             return None
@@ -541,69 +633,77 @@ class GoogleDrivePlugins:
             logger.error(f"Error finding most relevant file: {str(e)}")
             return None
     
+    def _format_too_many_files(self, query, files):
+        """Create the message asking for a more specific query when several files match."""
+        file_list = "\n".join(f"- {file['name']}" for file in islice(files, 5))
+        return f"Multiple files found matching '{query}'. Please be more specific:\n{file_list}"
+    
     def _create_file_detail(self, file):
         """Create a detailed text representation of a file."""
-        detail = "**File Details:**\n"
-        detail += f"**Name:** {file.get('name', 'Unknown')}\n"
-        detail += f"**ID:** {file.get('id', 'Unknown')}\n"
+        lines = [
+            "**File Details:**",
+            f"**Name:** {file.get('name', 'Unknown')}",
+            f"**ID:** {file.get('id', 'Unknown')}"
+        ]
+        append = lines.append
         
         # Format file size if available
         if 'size' in file:
-            size_bytes = int(file['size'])
-            size_str = self._format_file_size(size_bytes)
-            detail += f"**Size:** {size_str}\n"
+            append(f"**Size:** {self._format_file_size(int(file['size']))}")
         
         # Add mime type if available
         if 'mimeType' in file:
-            detail += f"**Type:** {file['mimeType']}\n"
+            append(f"**Type:** {file['mimeType']}")
         
         # Add dates if available
         if 'modifiedTime' in file:
-            detail += f"**Modified At:** {file['modifiedTime']}\n"
+            append(f"**Modified At:** {file['modifiedTime']}")
         
         # Add view link if available
         if 'webViewLink' in file:
-            detail += f"**View Link:** {file['webViewLink']}\n"
+            append(f"**View Link:** {file['webViewLink']}")
         
         # Add download link if available
         if 'webContentLink' in file:
-            detail += f"**Download Link:** {file['webContentLink']}\n"
+            append(f"**Download Link:** {file['webContentLink']}")
         
-        return detail
+        # End with a newline
+        append("")
+        return "\n".join(lines)
     
     def _create_search_results_summary(self, files):
         """Create a summary of multiple search results."""
-        summary = "**Multiple files found. Here are the details:**\n\n"
+        parts = ["**Multiple files found. Here are the details:**", ""]
+        append = parts.append
         
         for i, file in enumerate(files[:5], 1):  # Limit to 5 files and number them
-            summary += f"**{i}. {file.get('name', 'Unknown')}**\n"
-            summary += f"   ID: {file.get('id', 'Unknown')}\n"
+            append(f"**{i}. {file.get('name', 'Unknown')}**")
+            append(f"   ID: {file.get('id', 'Unknown')}")
             
             # Add size if available
             if 'size' in file:
-                size_str = self._format_file_size(int(file['size']))
-                summary += f"   Size: {size_str}\n"
+                append(f"   Size: {self._format_file_size(int(file['size']))}")
             
             # Add type if available
             if 'mimeType' in file:
-                summary += f"   Type: {file['mimeType']}\n"
+                append(f"   Type: {file['mimeType']}")
             
-            summary += "\n"
+            append("")
         
+        append("")
         if len(files) > 5:
-            summary += f"\n...and {len(files) - 5} more files.\n"
+            append(f"...and {len(files) - 5} more files.")
+            append("")
         
-        summary += "\nPlease provide a more specific query to find the exact file you want."
+        append("Please provide a more specific query to find the exact file you want.")
         
-        return summary
+        return "\n".join(parts)
     
     def _format_file_size(self, bytes):
         """Format file size in human-readable form."""
         sizes = ["B", "KB", "MB", "GB", "TB"]
-        order = 0
-        size = float(bytes)
-        while size >= 1024 and order < len(sizes) - 1:
-            order += 1
-            size /= 1024
+        # Each unit is 2**10 times the previous one, so the bit length gives the unit directly
+        order = min((bytes.bit_length() - 1) // 10, len(sizes) - 1) if bytes > 0 else 0
+        size = bytes / (1 << (order * 10))
         
         return f"{size:.2f} {sizes[order]}"
\ No newline at end of file
@@ -1,246 +1,192 @@
 import os
-from fastapi import FastAPI
-from fastapi.responses import HTMLResponse
+import gzip
+import contextlib
+from functools import lru_cache
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import ORJSONResponse, Response
 import uvicorn
-from services.box_service import BoxService
-from services.dropbox_service import DropboxService
+from services.box_service import get_default_box_service
+from services.dropbox_service import get_default_dropbox_service
 from services.google_drive_service import GoogleDriveService
 from services.gmail_service import GmailService
+from services.google_calendar_service import GoogleCalendarService
 from helpers.token_helpers import TokenEncryptionHelper
 import asyncio
 import logging
-import threading
 
 # Setup logging
 logger = logging.getLogger("oauth_server")
 
-app = FastAPI()
-box_service = BoxService()
-dropbox_service = DropboxService()
-google_drive_service = GoogleDriveService()
-gmail_service = GmailService()
+app = FastAPI(default_response_class=ORJSONResponse)
+
+# Callback path prefix -> (service class or factory, display name)
+_PROVIDERS = {
+    "box": (get_default_box_service, "Box"),
+    "dropbox": (get_default_dropbox_service, "Dropbox"),
+    "gdrive": (GoogleDriveService, "Google Drive"),
+    "gmail": (GmailService, "Gmail"),
+    "gcalendar": (GoogleCalendarService, "Google Calendar"),
+}
+
+# Seconds between checks for the embedded server finishing startup
+SERVER_STARTUP_POLL_INTERVAL = 0.05
+
+# Maximum number of token exchanges in flight per provider; further callbacks wait their turn
+MAX_CONCURRENT_CALLBACKS = 32
+_CALLBACK_SEMAPHORES = {provider: asyncio.Semaphore(MAX_CONCURRENT_CALLBACKS) for provider in _PROVIDERS}
+
+@lru_cache(maxsize=None)
+def _get_service(provider):
+    """Create the service for a provider on its first callback and reuse it afterwards."""
+    return _PROVIDERS[provider][0]()
+
+@lru_cache(maxsize=None)
+def _get_state_decryptor(provider):
+    """Build the function that decrypts a provider's OAuth state once and reuse it afterwards."""
+    return TokenEncryptionHelper.create_decryptor(_get_service(provider).encryption_key)
 
 # This will be set from bot.py
 bot = None
+server_task = None
 
-# Reusable HTML template function
-def get_success_html(service_name):
-    """
-    Generate HTML for successful authorization.
-    
-    Args:
-        service_name: The name of the service (Box, Dropbox, etc.)
-        
-    Returns:
-        str: HTML content for the success page
-    """
-    return f"""
+# Notifications waiting to be sent by the bot, created on first use
+notify_queue = None
+notify_task = None
+
+# Static parts of the success page around the service name, kept as encoded bytes
+_SUCCESS_HTML_PREFIX = """
     <!DOCTYPE html>
     <html>
         <head>
             <title>Authorization Successful</title>
             <style>
-                body {{
+                body {
                     font-family: Arial, sans-serif;
                     text-align: center;
                     padding: 50px;
                     background-color: #f8f9fa;
-                }}
-                .container {{
+                }
+                .container {
                     background-color: white;
                     border-radius: 8px;
                     padding: 30px;
                     box-shadow: 0 4px 6px rgba(0,0,0,0.1);
                     max-width: 500px;
                     margin: 0 auto;
-                }}
-                .success {{
+                }
+                .success {
                     color: #28a745;
                     font-size: 24px;
                     margin-bottom: 20px;
-                }}
-                .message {{
+                }
+                .message {
                     font-size: 18px;
                     margin-bottom: 15px;
                     color: #343a40;
-                }}
-                .footer {{
+                }
+                .footer {
                     margin-top: 30px;
                     font-size: 14px;
                     color: #6c757d;
-                }}
+                }
             </style>
         </head>
         <body>
             <div class="container">
                 <div class="success">✅ Authorization Successful!</div>
-                <div class="message">Your {service_name} account has been connected to the Discord bot.</div>
+                <div class="message">Your """.encode("utf-8")
+_SUCCESS_HTML_SUFFIX = """ account has been connected to the Discord bot.</div>
                 <div class="message">You can close this window and return to Discord.</div>
                 <div class="footer">You will also receive a confirmation message in Discord.</div>
             </div>
         </body>
     </html>
-    """
+    """.encode("utf-8")
 
-@app.get("/")
-async def root():
-    return {"message": "OAuth Callback Server for Box, Dropbox, Google Drive, and Gmail"}
-
-@app.get("/box/callback")
-async def box_callback(code: str, state: str):
+def get_success_html(service_name):
     """
-    Handle the OAuth callback from Box.
+    Generate HTML for successful authorization.
     
-    This endpoint receives the authorization code from Box after a user
-    authorizes the application. It exchanges the code for access and 
-    refresh tokens, stores them securely, and notifies the user.
-    """
-    try:
-        # Get user ID from state
-        user_id = TokenEncryptionHelper.decrypt_token(state, box_service.encryption_key)
-        logger.info(f"Received Box callback for user {user_id}")
-        
-        # Handle the callback - this stores the tokens
-        await box_service.handle_auth_callback(state, code)
-        
-        # Notify the user through Discord
-        if bot:
-            # Schedule the notification in the bot's event loop
-            asyncio.run_coroutine_threadsafe(notify_user(user_id, "Box"), bot.loop)
-        
-        # Use the reusable HTML template
-        html_content = get_success_html("Box")
+    Args:
+        service_name: The name of the service (Box, Dropbox, etc.)
         
-        return HTMLResponse(content=html_content)
-    except Exception as e:
-        logger.error(f"Error in Box callback: {str(e)}")
-        return {"error": str(e)}
-
-@app.get("/dropbox/callback")
-async def dropbox_callback(code: str, state: str):
-    """
-    Handle the OAuth callback from Dropbox.
-    
-    This endpoint receives the authorization code from Dropbox after a user
-    authorizes the application. It exchanges the code for access and 
-    refresh tokens, stores them securely, and notifies the user.
+    Returns:
+        bytes: UTF-8 encoded HTML content for the success page
     """
-    try:
-        # Get user ID from state
-        user_id = TokenEncryptionHelper.decrypt_token(state, dropbox_service.encryption_key)
-        logger.info(f"Received Dropbox callback for user {user_id}")
-        
-        # Handle the callback - this stores the tokens
-        await dropbox_service.handle_auth_callback(state, code)
-        
-        # Notify the user through Discord
-        if bot:
-            # Schedule the notification in the bot's event loop
-            asyncio.run_coroutine_threadsafe(notify_user(user_id, "Dropbox"), bot.loop)
-        
-        # Use the reusable HTML template
-        html_content = get_success_html("Dropbox")
-        
-        return HTMLResponse(content=html_content)
-    except Exception as e:
-        logger.error(f"Error in Dropbox callback: {str(e)}")
-        return {"error": str(e)}
+    return _SUCCESS_HTML_PREFIX + service_name.encode("utf-8") + _SUCCESS_HTML_SUFFIX
 
-@app.get("/gdrive/callback")
-async def gdrive_callback(code: str, state: str):
-    """
-    Handle the OAuth callback from Google Drive.
-    
-    This endpoint receives the authorization code from Google Drive after a user
-    authorizes the application. It exchanges the code for access and 
-    refresh tokens, stores them securely, and notifies the user.
-    """
-    try:
-        # Get user ID from state
-        user_id = TokenEncryptionHelper.decrypt_token(state, google_drive_service.encryption_key)
-        logger.info(f"Received Google Drive callback for user {user_id}")
-        
-        # Handle the callback - this stores the tokens
-        await google_drive_service.handle_auth_callback(state, code)
-        
-        # Notify the user through Discord
-        if bot:
-            # Schedule the notification in the bot's event loop
-            asyncio.run_coroutine_threadsafe(notify_user(user_id, "Google Drive"), bot.loop)
-        
-        # Use the reusable HTML template
-        html_content = get_success_html("Google Drive")
-        
-        return HTMLResponse(content=html_content)
-    except Exception as e:
-        logger.error(f"Error in Google Drive callback: {str(e)}")
-        return {"error": str(e)}
+# Success pages rendered and encoded once, since they only depend on the service name
+_SUCCESS_PAGES = {
+    service_name: get_success_html(service_name)
+    for _, service_name in _PROVIDERS.values()
+}
+
+# The same pages compressed once, for clients that accept gzip
+_SUCCESS_PAGES_GZIP = {service_name: gzip.compress(page, mtime=0) for service_name, page in _SUCCESS_PAGES.items()}
+_GZIP_HEADERS = {"Content-Encoding": "gzip", "Vary": "Accept-Encoding"}
+_HTML_MEDIA_TYPE = "text/html; charset=utf-8"
+
+# Routes return Response objects directly, so FastAPI skips response model validation and encoding
+@app.get("/", response_model=None)
+async def root():
+    return ORJSONResponse({"message": "OAuth Callback Server for Box, Dropbox, Google Drive, and Gmail"})
 
-@app.get("/gmail/callback")
-async def gmail_callback(code: str, state: str):
+@app.get("/{provider}/callback", response_model=None)
+async def oauth_callback(provider: str, code: str, state: str, request: Request):
     """
-    Handle the OAuth callback from Gmail.
+    Handle the OAuth callback from Box, Dropbox, Google Drive, Gmail or Google Calendar.
     
-    This endpoint receives the authorization code from Gmail after a user
+    This endpoint receives the authorization code from the provider after a user
     authorizes the application. It exchanges the code for access and 
     refresh tokens, stores them securely, and notifies the user.
     """
+    if provider not in _PROVIDERS:
+        raise HTTPException(status_code=404, detail="Not Found")
+    service = _get_service(provider)
+    service_name = _PROVIDERS[provider][1]
+    
     try:
         # Get user ID from state
-        user_id = TokenEncryptionHelper.decrypt_token(state, gmail_service.encryption_key)
-        logger.info(f"Received Gmail callback for user {user_id}")
+        user_id = _get_state_decryptor(provider)(state)
+        logger.info("Received %s callback for user %s", service_name, user_id)
         
         # Handle the callback - this stores the tokens
-        await gmail_service.handle_auth_callback(state, code)
+        async with _CALLBACK_SEMAPHORES[provider]:
+            await service.handle_auth_callback(state, code, user_id)
         
         # Notify the user through Discord
         if bot:
-            # Schedule the notification in the bot's event loop
-            asyncio.run_coroutine_threadsafe(notify_user(user_id, "Gmail"), bot.loop)
-        
-        # Use the reusable HTML template
-        html_content = get_success_html("Gmail")
+            # The server runs on the bot's event loop, so queue the notification directly
+            queue_notification(user_id, service_name)
         
-        return HTMLResponse(content=html_content)
-    except Exception as e:
-        logger.error(f"Error in Gmail callback: {str(e)}")
-        return {"error": str(e)}
+        # Use the prerendered success page
+        if "gzip" in request.headers.get("accept-encoding", ""):
+            return Response(content=_SUCCESS_PAGES_GZIP[service_name], media_type=_HTML_MEDIA_TYPE, headers=_GZIP_HEADERS)
+        return Response(content=_SUCCESS_PAGES[service_name], media_type=_HTML_MEDIA_TYPE)
+    except Exception:
+        # Details stay in the log; the browser only learns that the connection failed
+        logger.exception("Error in %s callback", service_name)
+        return ORJSONResponse({"error": f"Failed to connect {service_name}. Please try again."}, status_code=500)
 
-# Add this import at the top with the other imports
-from services.google_calendar_service import GoogleCalendarService
-
-# Add this after other service initializations
-google_calendar_service = GoogleCalendarService()
-
-@app.get("/gcalendar/callback")
-async def gcalendar_callback(code: str, state: str):
+def queue_notification(user_id, service_name):
     """
-    Handle the OAuth callback from Google Calendar.
+    Queue a Discord notification for the user.
     
-    This endpoint receives the authorization code from Google Calendar after a user
-    authorizes the application. It exchanges the code for access and 
-    refresh tokens, stores them securely, and notifies the user.
+    Args:
+        user_id: The Discord user ID
+        service_name: The name of the service (Box, Dropbox, etc.)
     """
-    try:
-        # Get user ID from state
-        user_id = TokenEncryptionHelper.decrypt_token(state, google_calendar_service.encryption_key)
-        logger.info(f"Received Google Calendar callback for user {user_id}")
-        
-        # Handle the callback - this stores the tokens
-        await google_calendar_service.handle_auth_callback(state, code)
-        
-        # Notify the user through Discord
-        if bot:
-            # Schedule the notification in the bot's event loop
-            asyncio.run_coroutine_threadsafe(notify_user(user_id, "Google Calendar"), bot.loop)
-        
-        # Use the reusable HTML template
-        html_content = get_success_html("Google Calendar")
-        
-        return HTMLResponse(content=html_content)
-    except Exception as e:
-        logger.error(f"Error in Google Calendar callback: {str(e)}")
-        return {"error": str(e)}
+    global notify_queue, notify_task
+    if notify_queue is None:
+        notify_queue = asyncio.Queue()
+        notify_task = asyncio.create_task(process_notifications())
+    notify_queue.put_nowait((user_id, service_name))
+
+async def process_notifications():
+    """Send queued notifications one at a time for as long as the bot runs."""
+    while True:
+        user_id, service_name = await notify_queue.get()
+        await notify_user(user_id, service_name)
 
 async def notify_user(user_id, service_name):
     """
@@ -251,23 +197,85 @@ async def notify_user(user_id, service_name):
         service_name: The name of the service (Box, Dropbox, etc.)
     """
     try:
-        user = await bot.fetch_user(int(user_id))
+        # Prefer the bot's user cache and only ask Discord's API for users it hasn't seen
+        discord_user_id = int(user_id)
+        user = bot.get_user(discord_user_id) or await bot.fetch_user(discord_user_id)
         if user:
             await user.send(f"✅ Your {service_name} account has been successfully connected! You can now use {service_name} commands.")
     except Exception as e:
-        logger.error(f"Error notifying user about {service_name}: {str(e)}")
+        logger.error("Error notifying user about %s: %s", service_name, e)
 
-def start_server(bot_instance=None):
+class EmbeddedServer(uvicorn.Server):
+    """A uvicorn server that leaves signal handling to the bot it runs alongside."""
+    
+    # uvicorn is pinned in requirements.txt; 0.27 installs handlers here, newer releases in capture_signals
+    def install_signal_handlers(self):
+        pass
+    
+    @contextlib.contextmanager
+    def capture_signals(self):
+        yield
+    
+    async def serve(self, sockets=None):
+        try:
+            await super().serve(sockets)
+        except SystemExit as e:
+            # uvicorn exits the process when startup fails (e.g. the port is taken); keep the bot running
+            raise RuntimeError(f"Server exited during startup with code {e.code}") from e
+
+def _log_server_exit(task, server):
     """
-    Start the FastAPI server using the port provided by Azure (if available)
+    Log why the server task ended, since nothing awaits it.
+    
+    Args:
+        task: The finished server task
+        server: The server the task was running
+    """
+    if task.cancelled():
+        return
+    error = task.exception()
+    if error is not None:
+        logger.error("OAuth callback server stopped", exc_info=error)
+    elif not server.started:
+        logger.error("OAuth callback server failed to start")
+
+async def start_server(bot_instance=None):
     """
+    Start the FastAPI server on the running event loop, using the port provided by Azure (if available)
+    
+    Args:
+        bot_instance: The Discord bot used to notify users
+        
+    Returns:
+        asyncio.Task: The task serving requests
+    """
+    global bot, server_task
+    if bot_instance is not None:
+        bot = bot_instance
+    
     port = int(os.environ.get("PORT", 8000))
     host = "0.0.0.0"
-
-    def run_server():
-        uvicorn.run(app, host=host, port=port, log_level="info")
-
-    server_thread = threading.Thread(target=run_server, daemon=True)
-    server_thread.start()
-    print(f"Server running on {host}:{port}")
-    return server_thread
+    
+    # http="auto" uses httptools, installed with uvicorn[standard], falling back to h11.
+    # Callbacks log themselves, so uvicorn's per-request access log is turned off.
+    # A single worker in this process keeps the bot and service state shared with the
+    # callbacks; more workers (or gunicorn) would each need their own copy of both.
+    config = uvicorn.Config(
+        app,
+        host=host,
+        port=port,
+        workers=1,
+        log_level="warning",
+        http="auto",
+        access_log=False
+    )
+    server = EmbeddedServer(config)
+    server_task = asyncio.create_task(server.serve())
+    server_task.add_done_callback(lambda task: _log_server_exit(task, server))
+    
+    # Wait for startup to finish one way or the other before reporting the server as running
+    while not server.started and not server_task.done():
+        await asyncio.sleep(SERVER_STARTUP_POLL_INTERVAL)
+    if server.started:
+        logger.info("Server running on %s:%s", host, port)
+    return server_task
@@ -1,9 +1,15 @@
 import os
-import json
-import requests
-from datetime import datetime, timedelta
+import orjson
+import base64
+import time
+import random
+import hashlib
+import asyncio
+import aiohttp
+from collections import defaultdict
+from functools import lru_cache
 from dotenv import load_dotenv
-from urllib.parse import urlencode
+from urllib.parse import urlencode, urlsplit, quote_plus
 import logging
 
 from helpers.token_helpers import (
@@ -25,6 +31,31 @@ BOX_API_BASE_URL = "https://api.box.com/2.0/"
 BOX_AUTH_BASE_URL = "https://account.box.com/api/oauth2/"
 BOX_UPLOAD_API_BASE_URL = "https://upload.box.com/api/2.0/"
 
+# Cached access tokens are treated as expired this many seconds early
+TOKEN_EXPIRY_MARGIN = 30
+# Tokens are refreshed in the background this many seconds before they expire
+TOKEN_REFRESH_LEAD = 300
+
+# Maximum number of open connections to Box shared by all requests
+BOX_CONNECTION_LIMIT = 100
+
+# Sustained requests per second sent to each Box host on behalf of one user
+BOX_REQUESTS_PER_SECOND = 10
+# Requests a user can send to a host in a burst before being paced to BOX_REQUESTS_PER_SECOND
+BOX_REQUEST_BURST = 20
+# Retries for rate-limited or transiently failing requests, with exponential backoff in seconds
+BOX_MAX_RETRIES = 3
+BOX_RETRY_BASE_DELAY = 0.5
+BOX_RETRY_MAX_DELAY = 30
+_RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+# Files larger than this are sent through Box's chunked upload sessions
+CHUNKED_UPLOAD_THRESHOLD = 50 * 1024 * 1024
+# Number of parts of a chunked upload sent at the same time
+CHUNKED_UPLOAD_WORKERS = 4
+# Number of times to poll a chunked upload commit that Box is still processing
+CHUNKED_UPLOAD_COMMIT_RETRIES = 5
+
 
 class BoxService:
     def __init__(self, config=None):
@@ -50,6 +81,26 @@ class BoxService:
             
         # Initialize token storage
         self.token_storage = TokenStorageManager()
+        
+        # Authorization URL up to the state value, which is the only per-user part
+        self._auth_url_prefix = f"{BOX_AUTH_BASE_URL}authorize?" + urlencode({
+            "client_id": self.client_id,
+            "response_type": "code",
+            "redirect_uri": self.redirect_uri
+        }) + "&state="
+        
+        # Decrypted access tokens: user_id -> (access_token, expires_at)
+        self._token_cache = {}
+        self._token_locks = defaultdict(asyncio.Lock)
+        # Scheduled background refreshes: user_id -> task
+        self._refresh_tasks = {}
+        # Request headers built from the current token: user_id -> (access_token, headers, JSON headers)
+        self._header_cache = {}
+        
+        # HTTP session reused across requests, created on first use
+        self._session = None
+        # Token buckets pacing each user's requests: (user_id, host) -> (tokens, monotonic timestamp)
+        self._rate_buckets = {}
     
     async def get_authorization_url(self, user_id):
         """
@@ -69,25 +120,18 @@ class BoxService:
         # Encrypt user_id as state parameter
         state = TokenEncryptionHelper.encrypt_token(user_id, self.encryption_key)
         
-        query = {
-            "client_id": self.client_id,
-            "response_type": "code",
-            "redirect_uri": self.redirect_uri,
-            "state": state
-        }
-        
-        query_string = urlencode(query)
-        auth_url = f"{BOX_AUTH_BASE_URL}authorize?{query_string}"
-        logger.info(f"Generated authorization URL for user {user_id}")
+        auth_url = self._auth_url_prefix + quote_plus(state)
+        logger.info("Generated authorization URL for user %s", user_id)
         return auth_url
     
-    async def handle_auth_callback(self, state, code):
+    async def handle_auth_callback(self, state, code, user_id=None):
         """
         Handle the authorization callback from Box.
         
         Args:
             state: The state parameter from the callback
             code: The authorization code from the callback
+            user_id: The user ID already decrypted from state, if available
         """
         if not self.client_id:
             raise ValueError("Box Client ID is not set in configuration.")
@@ -96,9 +140,10 @@ class BoxService:
         if not self.redirect_uri:
             raise ValueError("Box Redirect URI is not set in configuration.")
         
-        # Decrypt the user_id from state
-        user_id = TokenEncryptionHelper.decrypt_token(state, self.encryption_key)
-        logger.info(f"Processing authorization callback for user {user_id}")
+        # Decrypt the user_id from state unless the caller already did
+        if user_id is None:
+            user_id = TokenEncryptionHelper.decrypt_token(state, self.encryption_key)
+        logger.info("Processing authorization callback for user %s", user_id)
         
         payload = {
             "grant_type": "authorization_code",
@@ -108,20 +153,20 @@ class BoxService:
             "redirect_uri": self.redirect_uri
         }
         
-        response = requests.post(f"{BOX_AUTH_BASE_URL}token", data=payload)
-        response_data = response.json()
+        status, _, response_data = await self._request("POST", f"{BOX_AUTH_BASE_URL}token", data=payload)
+        response_data = response_data or {}
         
-        if response.status_code == 200 and "access_token" in response_data:
+        if status == 200 and "access_token" in response_data:
             await self._store_token(
                 user_id, 
                 response_data["access_token"], 
                 response_data["refresh_token"], 
                 response_data["expires_in"]
             )
-            logger.info(f"Successfully obtained and stored access token for user {user_id}")
+            logger.info("Successfully obtained and stored access token for user %s", user_id)
         else:
             error_msg = response_data.get("error_description", "Unknown error")
-            logger.error(f"Failed to obtain access token: {error_msg}")
+            logger.error("Failed to obtain access token: %s", error_msg)
             raise Exception(f"Failed to obtain user access token: {error_msg}")
     
     async def revoke_access(self, user_id):
@@ -146,15 +191,16 @@ class BoxService:
             "token": token
         }
         
-        response = requests.post(f"{BOX_AUTH_BASE_URL}revoke", data=payload)
+        status, _, _ = await self._request("POST", f"{BOX_AUTH_BASE_URL}revoke", data=payload)
         
-        if response.status_code == 200:
+        if status == 200:
             # Delete the token from storage
-            self.token_storage.delete_token(user_id, PLATFORM, SERVICE)
-            logger.info(f"Successfully revoked access for user {user_id}")
+            await self.token_storage.delete_token_async(user_id, PLATFORM, SERVICE)
+            self._forget_token(user_id)
+            logger.info("Successfully revoked access for user %s", user_id)
         else:
-            logger.error(f"Failed to revoke token: {response.status_code}")
-            raise Exception(f"Failed to revoke token: {response.status_code}")
+            logger.error("Failed to revoke token: %s", status)
+            raise Exception(f"Failed to revoke token: {status}")
     
     async def create_folder(self, user_id, folder_name, parent_folder_id="0"):
         """
@@ -172,28 +218,27 @@ class BoxService:
         if not token:
             raise self._create_auth_exception(user_id)
         
-        headers = {
-            "Authorization": f"Bearer {token}",
-            "Content-Type": "application/json"
-        }
+        headers = self._auth_headers(user_id, token, json_body=True)
         
         payload = {
             "name": folder_name,
             "parent": {"id": parent_folder_id}
         }
         
-        response = requests.post(
+        status, _, data = await self._request(
+            "POST",
             f"{BOX_API_BASE_URL}folders", 
             headers=headers, 
-            json=payload
+            json=payload,
+            user_id=user_id
         )
         
-        if response.status_code in (200, 201):
-            return response.json()
+        if status in (200, 201):
+            return data
         else:
-            self._handle_api_error(response, user_id)
+            await self._handle_api_error(status, data, user_id)
     
-    async def search_for_file(self, user_id, query, limit=100):
+    async def search_for_file(self, user_id, query, limit=100, fields=None):
         """
         Search for files in Box.
         
@@ -201,6 +246,7 @@ class BoxService:
             user_id: The user's ID
             query: Search query
             limit: Maximum number of results to return
+            fields: Comma-separated file fields to return, or None for Box's full default set
             
         Returns:
             dict: Search results
@@ -209,26 +255,29 @@ class BoxService:
         if not token:
             raise self._create_auth_exception(user_id)
         
-        headers = {
-            "Authorization": f"Bearer {token}"
-        }
+        headers = self._auth_headers(user_id, token)
         
         params = {
             "query": query,
-            "limit": limit,
+            "limit": str(limit),
             "type": "file"
         }
+        if fields:
+            # Box omits everything else, which shrinks the response and the JSON to decode
+            params["fields"] = fields
         
-        response = requests.get(
+        status, _, data = await self._request(
+            "GET",
             f"{BOX_API_BASE_URL}search", 
             headers=headers, 
-            params=params
+            params=params,
+            user_id=user_id
         )
         
-        if response.status_code == 200:
-            return response.json()
+        if status == 200:
+            return data
         else:
-            self._handle_api_error(response, user_id)
+            await self._handle_api_error(status, data, user_id)
     
     async def delete_file(self, user_id, file_id):
         """
@@ -242,17 +291,17 @@ class BoxService:
         if not token:
             raise self._create_auth_exception(user_id)
         
-        headers = {
-            "Authorization": f"Bearer {token}"
-        }
+        headers = self._auth_headers(user_id, token)
         
-        response = requests.delete(
+        status, _, data = await self._request(
+            "DELETE",
             f"{BOX_API_BASE_URL}files/{file_id}", 
-            headers=headers
+            headers=headers,
+            user_id=user_id
         )
         
-        if response.status_code != 204:  # 204 No Content is success
-            self._handle_api_error(response, user_id)
+        if status != 204:  # 204 No Content is success
+            await self._handle_api_error(status, data, user_id)
     
     async def upload_file(self, user_id, file_path, original_file_name, folder_id="0"):
         """
@@ -271,31 +320,156 @@ class BoxService:
         if not token:
             raise self._create_auth_exception(user_id)
         
-        headers = {
-            "Authorization": f"Bearer {token}"
-        }
+        headers = self._auth_headers(user_id, token)
+        
+        file_size = await asyncio.to_thread(os.path.getsize, file_path)
+        if file_size > CHUNKED_UPLOAD_THRESHOLD:
+            status, data = await self._upload_chunked(user_id, headers, file_path, original_file_name, folder_id, file_size)
+        else:
+            status, data = await self._upload_small(user_id, headers, file_path, original_file_name, folder_id)
         
-        attributes = json.dumps({
-            "name": original_file_name,
+        if status in (200, 201):
+            return data['entries'][0]  # Box returns an entries array
+        else:
+            await self._handle_api_error(status, data, user_id)
+    
+    async def _upload_small(self, user_id, headers, file_path, file_name, folder_id):
+        """
+        Upload a file in a single multipart request.
+        
+        Args:
+            user_id: The user's ID
+            headers: Request headers including authorization
+            file_path: Path to the local file
+            file_name: Name of the file in Box
+            folder_id: ID of the folder to upload to
+            
+        Returns:
+            tuple: (status code, parsed JSON body)
+        """
+        attributes = orjson.dumps({
+            "name": file_name,
             "parent": {"id": folder_id}
-        })
+        }).decode()
         
         with open(file_path, 'rb') as file:
-            files = {
-                'attributes': (None, attributes, 'application/json'),
-                'file': (original_file_name, file, 'application/octet-stream')
-            }
+            # aiohttp streams the file into the multipart body instead of loading it into memory
+            form = aiohttp.FormData()
+            form.add_field('attributes', attributes, content_type='application/json')
+            form.add_field('file', file, filename=file_name, content_type='application/octet-stream')
             
-            response = requests.post(
+            status, _, data = await self._request(
+                "POST",
                 f"{BOX_UPLOAD_API_BASE_URL}files/content", 
                 headers=headers,
-                files=files
+                data=form,
+                user_id=user_id
             )
         
-        if response.status_code in (200, 201):
-            return response.json()['entries'][0]  # Box returns an entries array
-        else:
-            self._handle_api_error(response, user_id)
+        return status, data
+    
+    async def _upload_chunked(self, user_id, headers, file_path, file_name, folder_id, file_size):
+        """
+        Upload a large file through a Box upload session, sending parts in parallel.
+        
+        The file is read once; each part is hashed as it is read and the whole-file
+        SHA1 required by the commit is built up from the same reads.
+        
+        Args:
+            user_id: The user's ID
+            headers: Request headers including authorization
+            file_path: Path to the local file
+            file_name: Name of the file in Box
+            folder_id: ID of the folder to upload to
+            file_size: Size of the file in bytes
+            
+        Returns:
+            tuple: (status code, parsed JSON body) of the commit request
+        """
+        status, _, upload_session = await self._request(
+            "POST",
+            f"{BOX_UPLOAD_API_BASE_URL}files/upload_sessions",
+            headers=headers,
+            json={"folder_id": folder_id, "file_size": file_size, "file_name": file_name},
+            user_id=user_id
+        )
+        if status not in (200, 201):
+            return status, upload_session
+        
+        endpoints = upload_session['session_endpoints']
+        part_size = upload_session['part_size']
+        file_sha1 = hashlib.sha1()
+        # Bounds the parts held in memory as well as the requests in flight
+        slots = asyncio.Semaphore(CHUNKED_UPLOAD_WORKERS)
+        tasks = []
+        
+        def read_part(file):
+            chunk = file.read(part_size)
+            file_sha1.update(chunk)
+            return chunk, base64.b64encode(hashlib.sha1(chunk).digest()).decode()
+        
+        async def upload_part(chunk, digest, offset):
+            try:
+                part_headers = {
+                    **headers,
+                    "Content-Type": "application/octet-stream",
+                    "Digest": f"sha={digest}",
+                    "Content-Range": f"bytes {offset}-{offset + len(chunk) - 1}/{file_size}"
+                }
+                # Not resent on failure: a part Box already stored would be uploaded twice
+                status, _, data = await self._request(
+                    "PUT",
+                    endpoints['upload_part'],
+                    headers=part_headers,
+                    data=chunk,
+                    user_id=user_id,
+                    retry=False
+                )
+                if status != 200:
+                    await self._handle_api_error(status, data, user_id)
+                return data['part']
+            finally:
+                slots.release()
+        
+        try:
+            with open(file_path, 'rb') as file:
+                offset = 0
+                while offset < file_size:
+                    await slots.acquire()
+                    chunk, digest = await asyncio.to_thread(read_part, file)
+                    if not chunk:
+                        slots.release()
+                        break
+                    tasks.append(asyncio.create_task(upload_part(chunk, digest, offset)))
+                    offset += len(chunk)
+            parts = await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            try:
+                await self._request("DELETE", endpoints['abort'], headers=headers, user_id=user_id)
+            except Exception as e:
+                logger.warning("Failed to abort upload session: %s", e)
+            raise
+        
+        commit_headers = {
+            **headers,
+            "Digest": f"sha={base64.b64encode(file_sha1.digest()).decode()}"
+        }
+        for _ in range(CHUNKED_UPLOAD_COMMIT_RETRIES):
+            status, response_headers, data = await self._request(
+                "POST",
+                endpoints['commit'],
+                headers=commit_headers,
+                json={"parts": parts},
+                user_id=user_id
+            )
+            # 202 means Box is still assembling the parts
+            if status != 202:
+                break
+            await asyncio.sleep(int(response_headers.get('Retry-After', 1)))
+        
+        return status, data
     
     async def get_file_download_link(self, user_id, file_id):
         """
@@ -312,21 +486,21 @@ class BoxService:
         if not token:
             raise self._create_auth_exception(user_id)
         
-        headers = {
-            "Authorization": f"Bearer {token}"
-        }
+        headers = self._auth_headers(user_id, token)
         
         # Box API redirects to the actual download URL, so we need to disable redirects
-        response = requests.get(
+        status, response_headers, data = await self._request(
+            "GET",
             f"{BOX_API_BASE_URL}files/{file_id}/content", 
             headers=headers,
-            allow_redirects=False
+            allow_redirects=False,
+            user_id=user_id
         )
         
-        if response.status_code == 302:  # Redirect status code
-            return response.headers.get('Location')
+        if status == 302:  # Redirect status code
+            return response_headers.get('Location')
         else:
-            self._handle_api_error(response, user_id)
+            await self._handle_api_error(status, data, user_id)
     
     async def get_file_view_link(self, user_id, file_id):
         """
@@ -343,29 +517,27 @@ class BoxService:
         if not token:
             raise self._create_auth_exception(user_id)
         
-        headers = {
-            "Authorization": f"Bearer {token}",
-            "Content-Type": "application/json"
-        }
+        headers = self._auth_headers(user_id, token, json_body=True)
         
         payload = {
             "shared_link": {"access": "open"}
         }
         
-        response = requests.put(
+        status, _, data = await self._request(
+            "PUT",
             f"{BOX_API_BASE_URL}files/{file_id}", 
             headers=headers,
-            json=payload
+            json=payload,
+            user_id=user_id
         )
         
-        if response.status_code == 200:
-            data = response.json()
+        if status == 200:
             if "shared_link" in data and "url" in data["shared_link"]:
                 return data["shared_link"]["url"]
             else:
                 raise Exception("Shared link URL not found in response")
         else:
-            self._handle_api_error(response, user_id)
+            await self._handle_api_error(status, data, user_id)
     
     async def share_file(self, user_id, file_id, email, role):
         """
@@ -381,10 +553,7 @@ class BoxService:
         if not token:
             raise self._create_auth_exception(user_id)
         
-        headers = {
-            "Authorization": f"Bearer {token}",
-            "Content-Type": "application/json"
-        }
+        headers = self._auth_headers(user_id, token, json_body=True)
         
         payload = {
             "item": {"id": file_id, "type": "file"},
@@ -392,14 +561,93 @@ class BoxService:
             "role": role
         }
         
-        response = requests.post(
+        status, _, data = await self._request(
+            "POST",
             f"{BOX_API_BASE_URL}collaborations", 
             headers=headers,
-            json=payload
+            json=payload,
+            user_id=user_id
         )
         
-        if response.status_code not in (200, 201):
-            self._handle_api_error(response, user_id)
+        if status not in (200, 201):
+            await self._handle_api_error(status, data, user_id)
+    
+    def _get_session(self):
+        """
+        Get the shared HTTP session, creating it on first use inside the running event loop.
+        
+        Returns:
+            aiohttp.ClientSession: The session
+        """
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=BOX_CONNECTION_LIMIT, ttl_dns_cache=300),
+                json_serialize=lambda obj: orjson.dumps(obj).decode()
+            )
+        return self._session
+    
+    async def close(self):
+        """Close the shared HTTP session."""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+    
+    async def _request(self, method, url, user_id=None, retry=True, **kwargs):
+        """
+        Send an HTTP request over the shared session, retrying rate-limited and transient failures.
+        
+        Args:
+            method: The HTTP method
+            url: The request URL
+            user_id: The user the request is made for; OAuth requests without one are not paced
+            retry: Whether the request may be resent; False for requests that must not be applied twice
+            **kwargs: Additional arguments for aiohttp's request
+            
+        Returns:
+            tuple: (status code, response headers, parsed JSON body or None)
+        """
+        host = urlsplit(url).hostname
+        # A streamed multipart body is consumed by the first attempt and cannot be resent
+        replayable = retry and not isinstance(kwargs.get("data"), aiohttp.FormData)
+        
+        for attempt in range(BOX_MAX_RETRIES + 1):
+            if user_id is not None:
+                await self._throttle((user_id, host))
+            async with self._get_session().request(method, url, **kwargs) as response:
+                if response.status not in _RETRY_STATUSES or not replayable or attempt == BOX_MAX_RETRIES:
+                    try:
+                        data = await response.json(loads=orjson.loads, content_type=None)
+                    except ValueError:
+                        data = None
+                    return response.status, response.headers, data
+                status = response.status
+                retry_after = response.headers.get("Retry-After", "")
+            
+            if retry_after.isdigit():
+                delay = int(retry_after)
+            else:
+                delay = min(BOX_RETRY_MAX_DELAY, BOX_RETRY_BASE_DELAY * 2 ** attempt) + random.uniform(0, BOX_RETRY_BASE_DELAY)
+            logger.warning("Box request to %s returned %s, retrying in %.1fs", host, status, delay)
+            await asyncio.sleep(delay)
+    
+    async def _throttle(self, key):
+        """
+        Wait until a request fits within a user's token bucket for a host.
+        
+        Buckets hold up to BOX_REQUEST_BURST tokens and refill at BOX_REQUESTS_PER_SECOND.
+        
+        Args:
+            key: The (user ID, host) pair the request is paced under
+        """
+        while True:
+            now = time.monotonic()
+            tokens, updated = self._rate_buckets.get(key, (BOX_REQUEST_BURST, now))
+            tokens = min(BOX_REQUEST_BURST, tokens + (now - updated) * BOX_REQUESTS_PER_SECOND)
+            if tokens >= 1:
+                self._rate_buckets[key] = (tokens - 1, now)
+                return
+            self._rate_buckets[key] = (tokens, now)
+            await asyncio.sleep((1 - tokens) / BOX_REQUESTS_PER_SECOND)
     
     async def _store_token(self, user_id, access_token, refresh_token, expires_in):
         """
@@ -414,17 +662,21 @@ class BoxService:
         token_data = {
             "access_token": access_token,
             "refresh_token": refresh_token,
-            "expires_at": (datetime.utcnow() + timedelta(seconds=expires_in)).timestamp()
+            "expires_at": time.time() + expires_in
         }
+        self._token_cache[user_id] = (access_token, token_data["expires_at"])
+        self._schedule_refresh(user_id, refresh_token, token_data["expires_at"])
         
         # Serialize and encrypt the token data
-        serialized_token = json.dumps(token_data)
+        serialized_token = orjson.dumps(token_data)
         encrypted_token = TokenEncryptionHelper.encrypt_token(serialized_token, self.encryption_key)
         
         # Store in the token storage using the helper function
         token_record = create_token_record(encrypted_token)
         
-        self.token_storage.store_token(user_id, PLATFORM, SERVICE, token_record)
+        # Persist before returning so a failed write reaches the auth callback or refresh caller
+        if not await self.token_storage.store_token_async(user_id, PLATFORM, SERVICE, token_record, durable=True):
+            raise Exception("Failed to save token")
     
     async def _load_token(self, user_id):
         """
@@ -436,49 +688,191 @@ class BoxService:
         Returns:
             str: The access token, or None if not found or expired
         """
-        token_record = self.token_storage.get_token(user_id, PLATFORM, SERVICE)
+        access_token = self._get_cached_token(user_id)
+        if access_token:
+            return access_token
         
-        if not token_record or not token_record.get("is_active") or token_record.get("is_revoked"):
-            logger.info(f"No valid token found in the storage for user {user_id}")
-            return None
+        # One load or refresh per user at a time; others wait and reuse its result
+        async with self._token_locks[user_id]:
+            access_token = self._get_cached_token(user_id)
+            if access_token:
+                return access_token
+            
+            return await self._load_stored_token(user_id)
+    
+    def _get_cached_token(self, user_id):
+        """
+        Get a cached access token that is not about to expire.
         
-        try:
-            encrypted_token = token_record.get("encrypted_token")
-            if not encrypted_token:
-                return None
+        Args:
+            user_id: The user's ID
             
-            decrypted_token = TokenEncryptionHelper.decrypt_token(encrypted_token, self.encryption_key)
-            token_data = json.loads(decrypted_token)
+        Returns:
+            str: The access token, or None if not cached or about to expire
+        """
+        cached = self._token_cache.get(user_id)
+        if cached and cached[1] - TOKEN_EXPIRY_MARGIN > time.time():
+            return cached[0]
+        return None
+    
+    async def _load_stored_token(self, user_id):
+        """
+        Load and decrypt a token from the token storage, refreshing it if expired.
+        
+        Args:
+            user_id: The user's ID
             
+        Returns:
+            str: The access token, or None if not found or expired
+        """
+        try:
+            token_data = await self._read_stored_token_data(user_id)
             if not token_data:
-                logger.error("Failed to deserialize token data")
+                logger.info("No valid token found in the storage for user %s", user_id)
                 return None
             
             # Check if token is expired
             expires_at = token_data.get("expires_at")
-            if expires_at and expires_at <= datetime.utcnow().timestamp():
-                logger.info(f"Token expired for user {user_id}, attempting to refresh")
+            if expires_at and expires_at <= time.time():
+                logger.info("Token expired for user %s, attempting to refresh", user_id)
                 refresh_token = token_data.get("refresh_token")
                 if refresh_token:
                     try:
                         return await self._refresh_token(user_id, refresh_token)
                     except Exception as e:
-                        logger.error(f"Error refreshing token: {str(e)}")
+                        logger.error("Error refreshing token: %s", e)
                         return None
                 return None
             
-            return token_data.get("access_token")
+            access_token = token_data.get("access_token")
+            if access_token and expires_at:
+                self._token_cache[user_id] = (access_token, expires_at)
+                if token_data.get("refresh_token"):
+                    self._schedule_refresh(user_id, token_data["refresh_token"], expires_at)
+            return access_token
         except Exception as e:
-            logger.error(f"Error loading token: {str(e)}")
+            logger.error("Error loading token: %s", e)
+            return None
+    
+    async def _read_stored_token_data(self, user_id):
+        """
+        Read and decrypt a user's stored token data, ignoring inactive or revoked records.
+        
+        Args:
+            user_id: The user's ID
+            
+        Returns:
+            dict: The token data (access_token, refresh_token, expires_at), or None if there is no usable record
+        """
+        token_record = await self.token_storage.get_token_async(user_id, PLATFORM, SERVICE)
+        if not token_record or not token_record.get("is_active") or token_record.get("is_revoked"):
+            return None
+        
+        encrypted_token = token_record.get("encrypted_token")
+        if not encrypted_token:
             return None
+        
+        decrypted_token = TokenEncryptionHelper.decrypt_token(encrypted_token, self.encryption_key)
+        if TokenEncryptionHelper.is_legacy_token(encrypted_token):
+            # Migrate tokens still encrypted with Fernet to AES-GCM
+            await self.token_storage.store_token_async(user_id, PLATFORM, SERVICE, {
+                **token_record,
+                "encrypted_token": TokenEncryptionHelper.encrypt_token(decrypted_token, self.encryption_key)
+            })
+        return orjson.loads(decrypted_token) or None
+    
+    def _auth_headers(self, user_id, token, json_body=False):
+        """
+        Get request headers for a token, reusing the ones built for the user's previous request.
+        
+        The returned dict is shared and must not be modified.
+        
+        Args:
+            user_id: The user's ID
+            token: The access token
+            json_body: Whether the request sends a JSON body
+            
+        Returns:
+            dict: The request headers
+        """
+        cached = self._header_cache.get(user_id)
+        if cached is None or cached[0] != token:
+            headers = {"Authorization": f"Bearer {token}"}
+            cached = (token, headers, {**headers, "Content-Type": "application/json"})
+            self._header_cache[user_id] = cached
+        return cached[2] if json_body else cached[1]
     
-    async def _refresh_token(self, user_id, refresh_token):
+    def _forget_token(self, user_id):
+        """
+        Drop a user's cached access token and any scheduled background refresh.
+        
+        Args:
+            user_id: The user's ID
+        """
+        self._token_cache.pop(user_id, None)
+        self._header_cache.pop(user_id, None)
+        task = self._refresh_tasks.pop(user_id, None)
+        if task and task is not asyncio.current_task():
+            task.cancel()
+    
+    def _schedule_refresh(self, user_id, refresh_token, expires_at):
+        """
+        Schedule a background refresh shortly before a token expires, replacing any earlier one.
+        
+        Args:
+            user_id: The user's ID
+            refresh_token: The refresh token to use
+            expires_at: Expiry time of the access token as a timestamp
+        """
+        task = self._refresh_tasks.pop(user_id, None)
+        # A refresh that is storing its own result must not cancel itself
+        if task and task is not asyncio.current_task():
+            task.cancel()
+        
+        delay = max(expires_at - TOKEN_REFRESH_LEAD - time.time(), 0)
+        self._refresh_tasks[user_id] = asyncio.create_task(
+            self._background_refresh(user_id, refresh_token, delay)
+        )
+    
+    async def _background_refresh(self, user_id, refresh_token, delay):
+        """
+        Refresh a token after a delay so requests never wait for the refresh themselves.
+        
+        Args:
+            user_id: The user's ID
+            refresh_token: The refresh token to use
+            delay: Seconds to wait before refreshing
+        """
+        await asyncio.sleep(delay)
+        # Shares the lock with _load_token so an inline refresh never uses the same refresh token
+        async with self._token_locks[user_id]:
+            try:
+                # Box refresh tokens are single use; if the stored one has moved on, this one is spent
+                token_data = await self._read_stored_token_data(user_id)
+                if not token_data or token_data.get("refresh_token") != refresh_token:
+                    logger.info("Stored token changed for user %s, skipping background refresh", user_id)
+                    if token_data and token_data.get("access_token") and token_data.get("expires_at"):
+                        self._token_cache[user_id] = (token_data["access_token"], token_data["expires_at"])
+                        if token_data.get("refresh_token"):
+                            self._schedule_refresh(user_id, token_data["refresh_token"], token_data["expires_at"])
+                    return
+                
+                # A failure here leaves the still valid access token alone; _load_token retries once it expires
+                await self._refresh_token(user_id, refresh_token, revoke_on_failure=False)
+            except Exception as e:
+                logger.error("Background token refresh failed for user %s: %s", user_id, e)
+            finally:
+                if self._refresh_tasks.get(user_id) is asyncio.current_task():
+                    del self._refresh_tasks[user_id]
+    
+    async def _refresh_token(self, user_id, refresh_token, revoke_on_failure=True):
         """
         Refresh an expired token.
         
         Args:
             user_id: The user's ID
             refresh_token: The refresh token
+            revoke_on_failure: Whether to mark the stored token revoked if Box rejects the refresh
             
         Returns:
             str: The new access token
@@ -495,60 +889,69 @@ class BoxService:
             "client_secret": self.client_secret
         }
         
-        logger.info(f"Attempting to refresh token for user {user_id}")
-        response = requests.post(f"{BOX_AUTH_BASE_URL}token", data=payload)
-        response_data = response.json()
+        logger.info("Attempting to refresh token for user %s", user_id)
+        status, _, response_data = await self._request("POST", f"{BOX_AUTH_BASE_URL}token", data=payload)
+        response_data = response_data or {}
         
-        if response.status_code == 200 and "access_token" in response_data:
+        if status == 200 and "access_token" in response_data:
             await self._store_token(
                 user_id, 
                 response_data["access_token"], 
                 response_data["refresh_token"], 
                 response_data["expires_in"]
             )
-            logger.info(f"Successfully refreshed token for user {user_id}")
+            logger.info("Successfully refreshed token for user %s", user_id)
             return response_data["access_token"]
         else:
             error_msg = response_data.get("error_description", "Unknown error")
-            logger.error(f"Failed to refresh token: {error_msg}")
+            logger.error("Failed to refresh token: %s", error_msg)
             # If refresh fails, mark the token as revoked so we don't keep trying
-            token_record = self.token_storage.get_token(user_id, PLATFORM, SERVICE)
-            if token_record:
-                token_record["is_revoked"] = True
-                self.token_storage.store_token(user_id, PLATFORM, SERVICE, token_record)
+            if revoke_on_failure:
+                self._forget_token(user_id)
+                await self._mark_token_revoked(user_id)
             raise Exception(f"Failed to refresh token: {error_msg}")
     
-    def _handle_api_error(self, response, user_id):
+    async def _mark_token_revoked(self, user_id):
+        """
+        Mark a user's stored token as revoked so it is not used again.
+        
+        Args:
+            user_id: The user's ID
+        """
+        token_record = await self.token_storage.get_token_async(user_id, PLATFORM, SERVICE)
+        if token_record:
+            # Copy instead of modifying the record, which may be shared with the storage cache
+            token_record = {**token_record, "is_revoked": True}
+            await self.token_storage.store_token_async(user_id, PLATFORM, SERVICE, token_record)
+    
+    async def _handle_api_error(self, status, data, user_id):
         """
         Handle API errors and check for authentication issues.
         
         Args:
-            response: The response object
+            status: The response status code
+            data: The parsed JSON response body, or None if it was not JSON
             user_id: The user's ID
             
         Raises:
             Exception: With appropriate error message
         """
-        try:
-            error_data = response.json()
-            error_msg = error_data.get("message", "Unknown error")
-            
-            # Check if this is an authentication error
-            if response.status_code in (401, 403):
-                # Mark token as revoked
-                token_record = self.token_storage.get_token(user_id, PLATFORM, SERVICE)
-                if token_record:
-                    token_record["is_revoked"] = True
-                    self.token_storage.store_token(user_id, PLATFORM, SERVICE, token_record)
-                
-                # Raise authentication exception
-                raise self._create_auth_exception(user_id)
+        # Check if this is an authentication error
+        if status in (401, 403):
+            # Mark token as revoked
+            self._forget_token(user_id)
+            await self._mark_token_revoked(user_id)
             
-            # For other errors
-            raise Exception(f"Box API request failed: {error_msg}")
-        except ValueError:
+            # Raise authentication exception
+            raise self._create_auth_exception(user_id)
+        
+        if not isinstance(data, dict):
             # Response couldn't be parsed as JSON
-            raise Exception(f"Box API request failed with status code: {response.status_code}")
+            raise Exception(f"Box API request failed with status code: {status}")
+        
+        # For other errors
+        error_msg = data.get("message", "Unknown error")
+        raise Exception(f"Box API request failed: {error_msg}")
     
     def _create_auth_exception(self, user_id):
         """
@@ -564,4 +967,19 @@ class BoxService:
         return Exception(
             "Your Box authorization has expired or is invalid. "
             "Please use the `!authorize-box` command to reconnect your Box account."
-        )
\ No newline at end of file
+        )
+
+
+@lru_cache(maxsize=1)
+def get_default_box_service():
+    """
+    Get the process-wide BoxService configured from the environment.
+    
+    Use this instead of BoxService() so every caller shares one token cache and one
+    background refresh per user; Box refresh tokens are single use, so separate
+    instances refreshing the same user would invalidate each other.
+    
+    Returns:
+        BoxService: The shared service
+    """
+    return BoxService()
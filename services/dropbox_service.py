@@ -1,8 +1,13 @@
 import os
 import json
-import requests
+import orjson
+import time
+import random
 import base64
-from datetime import datetime, timedelta
+import asyncio
+import aiohttp
+from collections import defaultdict
+from functools import lru_cache
 from dotenv import load_dotenv
 from urllib.parse import urlencode
 import logging
@@ -26,6 +31,55 @@ DROPBOX_API_BASE_URL = "https://api.dropboxapi.com/2/"
 DROPBOX_CONTENT_API_BASE_URL = "https://content.dropboxapi.com/2/"
 DROPBOX_AUTH_BASE_URL = "https://www.dropbox.com/oauth2/"
 
+# Files larger than this are sent through an upload session, in chunks of DROPBOX_UPLOAD_CHUNK_SIZE
+DROPBOX_UPLOAD_SESSION_THRESHOLD = 150 * 1024 * 1024
+DROPBOX_UPLOAD_CHUNK_SIZE = 4 * 1024 * 1024
+
+# Cached access tokens are treated as expired this many seconds early
+TOKEN_EXPIRY_MARGIN = 60
+# Stored tokens are refreshed this many seconds before they expire, allowing for clock skew with Dropbox
+TOKEN_REFRESH_SKEW = 300
+# Seconds to remember that a user has no usable token, so repeated commands skip the storage read
+MISSING_TOKEN_TTL = 10
+
+# Connection pool limits for the shared HTTP session
+DROPBOX_CONNECTION_LIMIT = 100
+DROPBOX_CONNECTION_LIMIT_PER_HOST = 20
+# Seconds an idle connection is kept open, so calls spaced out by user think time skip the TLS handshake
+DROPBOX_KEEPALIVE_TIMEOUT = 60
+
+# Fixed parts of request payloads, merged with the per-call fields
+_LIST_FOLDER_OPTIONS = {
+    "recursive": False,
+    "include_media_info": False,
+    "include_deleted": False,
+    "include_has_explicit_shared_members": False
+}
+_SEARCH_MODE = {".tag": "filename_and_content"}
+
+# Retries for rate-limited or transiently failing requests, with exponential backoff in seconds
+DROPBOX_MAX_RETRIES = 3
+DROPBOX_RETRY_BASE_DELAY = 0.5
+DROPBOX_RETRY_MAX_DELAY = 30
+_RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+# Maximum number of requests a bulk helper runs at the same time
+MAX_CONCURRENT_BULK_REQUESTS = 10
+
+def _incorrect_offset(data):
+    """
+    Get the offset Dropbox expects from an upload session incorrect_offset error.
+    
+    Args:
+        data: The parsed JSON error body, or None
+        
+    Returns:
+        int: The correct offset, or None if the error is something else
+    """
+    error = data.get("error") if isinstance(data, dict) else None
+    if isinstance(error, dict) and error.get(".tag") == "incorrect_offset":
+        return error.get("correct_offset")
+    return None
 
 class DropboxService:
     def __init__(self, config=None):
@@ -53,6 +107,26 @@ class DropboxService:
             
         # Initialize token storage
         self.token_storage = TokenStorageManager()
+        
+        # Basic auth headers for app-authenticated calls, built once from the fixed credentials
+        self._basic_auth_headers = None
+        if self.client_id and self.client_secret:
+            base64_auth = base64.b64encode(f"{self.client_id}:{self.client_secret}".encode('ascii')).decode('ascii')
+            self._basic_auth_headers = {
+                "Authorization": f"Basic {base64_auth}",
+                "Content-Type": "application/json"
+            }
+        
+        # Decrypted access tokens: user_id -> (access_token, expires_at)
+        self._token_cache = {}
+        self._token_locks = defaultdict(asyncio.Lock)
+        # Users with no usable token: user_id -> time until which storage is not checked again
+        self._missing_tokens = {}
+        # Request headers built from the current token: user_id -> (access_token, headers)
+        self._header_cache = {}
+        
+        # HTTP session reused across requests, created on first use
+        self._session = None
     
     async def get_authorization_url(self, user_id):
         """
@@ -85,13 +159,14 @@ class DropboxService:
         logger.info(f"Generated authorization URL for user {user_id}")
         return auth_url
     
-    async def handle_auth_callback(self, state, code):
+    async def handle_auth_callback(self, state, code, user_id=None):
         """
         Handle the authorization callback from Dropbox.
         
         Args:
             state: The state parameter from the callback
             code: The authorization code from the callback
+            user_id: The user ID already decrypted from state, if available
         """
         if not self.client_id:
             raise ValueError("Dropbox Client ID is not set in configuration.")
@@ -100,8 +175,9 @@ class DropboxService:
         if not self.redirect_uri:
             raise ValueError("Dropbox Redirect URI is not set in configuration.")
         
-        # Decrypt the user_id from state
-        user_id = TokenEncryptionHelper.decrypt_token(state, self.encryption_key)
+        # Decrypt the user_id from state unless the caller already did
+        if user_id is None:
+            user_id = TokenEncryptionHelper.decrypt_token(state, self.encryption_key)
         logger.info(f"Processing authorization callback for user {user_id}")
         
         payload = {
@@ -112,10 +188,10 @@ class DropboxService:
             "redirect_uri": self.redirect_uri
         }
         
-        response = requests.post(f"{DROPBOX_AUTH_BASE_URL}token", data=payload)
-        response_data = response.json()
+        status, _, response_data = await self._request("POST", f"{DROPBOX_AUTH_BASE_URL}token", data=payload)
+        response_data = response_data or {}
         
-        if response.status_code == 200 and "access_token" in response_data:
+        if status == 200 and "access_token" in response_data:
             # Calculate expiry time (Dropbox tokens usually last 4 hours by default)
             expires_in = response_data.get("expires_in", 14400)  # 4 hours in seconds
             
@@ -142,33 +218,33 @@ class DropboxService:
         if not token:
             raise ValueError("No valid token found for user")
         
-        headers = {
-            "Content-Type": "application/json"
-        }
+        if not self._basic_auth_headers:
+            raise ValueError("Dropbox Client ID and Client Secret must be set in configuration.")
         
-        # Dropbox requires token to be in Authorization header
-        auth_value = f"{self.client_id}:{self.client_secret}"
-        auth_bytes = auth_value.encode('ascii')
-        base64_auth = base64.b64encode(auth_bytes).decode('ascii')
-        headers["Authorization"] = f"Basic {base64_auth}"
+        # Dropbox requires the app credentials in the Authorization header
+        headers = self._basic_auth_headers
         
         payload = {
             "token": token
         }
         
-        response = requests.post(
+        status, _, data = await self._request(
+            "POST",
             f"{DROPBOX_API_BASE_URL}auth/token/revoke", 
             headers=headers, 
             json=payload
         )
         
-        if response.status_code == 200:
+        if status == 200:
             # Delete the token from storage
-            self.token_storage.delete_token(user_id, PLATFORM, SERVICE)
+            await self.token_storage.delete_token_async(user_id, PLATFORM, SERVICE)
+            self._token_cache.pop(user_id, None)
+            self._header_cache.pop(user_id, None)
+            self._missing_tokens.pop(user_id, None)
             logger.info(f"Successfully revoked access for user {user_id}")
         else:
-            logger.error(f"Failed to revoke token: {response.status_code}")
-            raise Exception(f"Failed to revoke token: {response.status_code}")
+            logger.error(f"Failed to revoke token: {status}")
+            raise Exception(f"Failed to revoke token: {status}")
     
     async def list_folder(self, user_id, path=""):
         """
@@ -185,29 +261,21 @@ class DropboxService:
         if not token:
             raise self._create_auth_exception(user_id)
         
-        headers = {
-            "Authorization": f"Bearer {token}",
-            "Content-Type": "application/json"
-        }
+        headers = self._auth_headers(user_id, token)
         
-        payload = {
-            "path": path,
-            "recursive": False,
-            "include_media_info": False,
-            "include_deleted": False,
-            "include_has_explicit_shared_members": False
-        }
+        payload = {"path": path, **_LIST_FOLDER_OPTIONS}
         
-        response = requests.post(
+        status, _, data = await self._request(
+            "POST",
             f"{DROPBOX_API_BASE_URL}files/list_folder", 
             headers=headers, 
             json=payload
         )
         
-        if response.status_code == 200:
-            return response.json()
+        if status == 200:
+            return data
         else:
-            self._handle_api_error(response, user_id)
+            await self._handle_api_error(status, data, user_id)
     
     async def search_files(self, user_id, query, path="", max_results=10):
         """
@@ -226,30 +294,26 @@ class DropboxService:
         if not token:
             raise self._create_auth_exception(user_id)
         
-        headers = {
-            "Authorization": f"Bearer {token}",
-            "Content-Type": "application/json"
-        }
+        headers = self._auth_headers(user_id, token)
         
         payload = {
             "query": query,
             "path": path if path else "",
             "max_results": max_results,
-            "mode": {
-                ".tag": "filename_and_content"
-            }
+            "mode": _SEARCH_MODE
         }
         
-        response = requests.post(
+        status, _, data = await self._request(
+            "POST",
             f"{DROPBOX_API_BASE_URL}files/search_v2", 
             headers=headers, 
             json=payload
         )
         
-        if response.status_code == 200:
-            return response.json()
+        if status == 200:
+            return data
         else:
-            self._handle_api_error(response, user_id)
+            await self._handle_api_error(status, data, user_id)
     
     async def create_folder(self, user_id, path):
         """
@@ -266,30 +330,28 @@ class DropboxService:
         if not token:
             raise self._create_auth_exception(user_id)
         
-        headers = {
-            "Authorization": f"Bearer {token}",
-            "Content-Type": "application/json"
-        }
+        headers = self._auth_headers(user_id, token)
         
         payload = {
             "path": path,
             "autorename": False
         }
         
-        response = requests.post(
+        status, _, data = await self._request(
+            "POST",
             f"{DROPBOX_API_BASE_URL}files/create_folder_v2", 
             headers=headers, 
             json=payload
         )
         
-        if response.status_code == 200:
-            return response.json()
-        elif response.status_code == 409:
+        if status == 200:
+            return data
+        elif status == 409:
             # Folder already exists
             logger.info(f"Folder already exists at path: {path}")
             return {"metadata": {"path": path, "name": path.split('/')[-1]}}
         else:
-            self._handle_api_error(response, user_id)
+            await self._handle_api_error(status, data, user_id)
     
     async def upload_file(self, user_id, local_file_path, dropbox_path):
         """
@@ -307,30 +369,101 @@ class DropboxService:
         if not token:
             raise self._create_auth_exception(user_id)
         
-        headers = {
-            "Authorization": f"Bearer {token}",
-            "Dropbox-API-Arg": json.dumps({
-                "path": dropbox_path,
-                "mode": "overwrite",
-                "autorename": True,
-                "mute": False
-            }),
-            "Content-Type": "application/octet-stream"
+        commit = {
+            "path": dropbox_path,
+            "mode": "overwrite",
+            "autorename": True,
+            "mute": False
         }
         
-        with open(local_file_path, "rb") as f:
-            file_data = f.read()
+        file_size = await asyncio.to_thread(os.path.getsize, local_file_path)
+        if file_size > DROPBOX_UPLOAD_SESSION_THRESHOLD:
+            status, data = await self._upload_session(token, local_file_path, commit, file_size)
+        else:
+            headers = {
+                "Authorization": f"Bearer {token}",
+                # json.dumps escapes non-ASCII characters, which HTTP headers require
+                "Dropbox-API-Arg": json.dumps(commit),
+                "Content-Type": "application/octet-stream"
+            }
+            
+            with await asyncio.to_thread(open, local_file_path, "rb") as f:
+                # aiohttp streams the open file instead of loading it into memory
+                status, _, data = await self._request(
+                    "POST",
+                    f"{DROPBOX_CONTENT_API_BASE_URL}files/upload", 
+                    headers=headers, 
+                    data=f
+                )
+        
+        if status in (200, 201):
+            return data
+        else:
+            await self._handle_api_error(status, data, user_id)
+    
+    async def _upload_session(self, token, local_file_path, commit, file_size):
+        """
+        Upload a large file in chunks through a Dropbox upload session.
         
-        response = requests.post(
-            f"{DROPBOX_CONTENT_API_BASE_URL}files/upload", 
-            headers=headers, 
-            data=file_data
-        )
+        Args:
+            token: The access token
+            local_file_path: Path to the local file
+            commit: Upload arguments (path, mode, autorename, mute) for the finished file
+            file_size: Size of the file in bytes
+            
+        Returns:
+            tuple: (status code, parsed JSON body) of the failed or finishing request
+        """
+        def chunk_headers(arg):
+            return {
+                "Authorization": f"Bearer {token}",
+                "Dropbox-API-Arg": json.dumps(arg),
+                "Content-Type": "application/octet-stream"
+            }
         
-        if response.status_code in (200, 201):
-            return response.json()
-        else:
-            self._handle_api_error(response, user_id)
+        with await asyncio.to_thread(open, local_file_path, "rb") as f:
+            chunk = await asyncio.to_thread(f.read, DROPBOX_UPLOAD_CHUNK_SIZE)
+            status, _, data = await self._request(
+                "POST",
+                f"{DROPBOX_CONTENT_API_BASE_URL}files/upload_session/start",
+                headers=chunk_headers({"close": False}),
+                data=chunk
+            )
+            if status != 200:
+                return status, data
+            cursor = {"session_id": data["session_id"], "offset": len(chunk)}
+            
+            # Every chunk but the last is appended; the last one goes with the finish request.
+            # An empty read means the file shrank since it was measured, so finish at the real offset.
+            chunk = await asyncio.to_thread(f.read, DROPBOX_UPLOAD_CHUNK_SIZE)
+            while chunk and cursor["offset"] + len(chunk) < file_size:
+                status, _, data = await self._request(
+                    "POST",
+                    f"{DROPBOX_CONTENT_API_BASE_URL}files/upload_session/append_v2",
+                    headers=chunk_headers({"cursor": cursor, "close": False}),
+                    data=chunk
+                )
+                correct_offset = _incorrect_offset(data) if status == 409 else None
+                if correct_offset is not None and correct_offset != cursor["offset"]:
+                    # A retried append already landed or the session moved on; resume where Dropbox is
+                    logger.warning("Resuming upload session at offset %s instead of %s", correct_offset, cursor["offset"])
+                    cursor["offset"] = correct_offset
+                    await asyncio.to_thread(f.seek, correct_offset)
+                elif status != 200:
+                    return status, data
+                else:
+                    cursor["offset"] += len(chunk)
+                chunk = await asyncio.to_thread(f.read, DROPBOX_UPLOAD_CHUNK_SIZE)
+            
+            status, _, data = await self._request(
+                "POST",
+                f"{DROPBOX_CONTENT_API_BASE_URL}files/upload_session/finish",
+                headers=chunk_headers({"cursor": cursor, "commit": commit}),
+                data=chunk,
+                retry=False
+            )
+        
+        return status, data
     
     async def delete_file(self, user_id, path):
         """
@@ -344,23 +477,21 @@ class DropboxService:
         if not token:
             raise self._create_auth_exception(user_id)
         
-        headers = {
-            "Authorization": f"Bearer {token}",
-            "Content-Type": "application/json"
-        }
+        headers = self._auth_headers(user_id, token)
         
         payload = {
             "path": path
         }
         
-        response = requests.post(
+        status, _, data = await self._request(
+            "POST",
             f"{DROPBOX_API_BASE_URL}files/delete_v2", 
             headers=headers, 
             json=payload
         )
         
-        if response.status_code != 200:
-            self._handle_api_error(response, user_id)
+        if status != 200:
+            await self._handle_api_error(status, data, user_id)
     
     async def get_temporary_link(self, user_id, path):
         """
@@ -377,59 +508,93 @@ class DropboxService:
         if not token:
             raise self._create_auth_exception(user_id)
         
-        # Check if path starts with an ID
-        if path.startswith('id:'):
-            logger.info(f"Using ID format for path: {path}")
-        else:
-            # Ensure path starts with a slash
-            if not path.startswith('/'):
-                path = '/' + path
-                logger.info(f"Path was reformatted to include leading slash: {path}")
-        
-        headers = {
-            "Authorization": f"Bearer {token}",
-            "Content-Type": "application/json"
-        }
+        # Paths other than "id:" references must start with a slash
+        if not path.startswith(('id:', '/')):
+            path = '/' + path
+            logger.debug("Path was reformatted to include leading slash: %s", path)
+        
+        headers = self._auth_headers(user_id, token)
         
         payload = {
             "path": path
         }
         
-        response = requests.post(
+        status, _, data = await self._request(
+            "POST",
             f"{DROPBOX_API_BASE_URL}files/get_temporary_link", 
             headers=headers, 
             json=payload
         )
         
-        if response.status_code == 200:
-            data = response.json()
+        if status == 200:
             if "link" in data:
                 return data["link"]
             else:
-                logger.error(f"Link not found in response: {json.dumps(data)}")
+                logger.error(f"Link not found in response: {orjson.dumps(data).decode()}")
                 raise Exception("Link not found in response")
         else:
-            try:
-                error_data = response.json()
-                logger.error(f"Error response: {json.dumps(error_data)}")
+            if isinstance(data, dict):
+                logger.error(f"Error response: {orjson.dumps(data).decode()}")
                 
                 # Check for specific error information
-                if "error" in error_data:
-                    if isinstance(error_data["error"], dict) and ".tag" in error_data["error"]:
-                        error_type = error_data["error"][".tag"]
+                if "error" in data:
+                    if isinstance(data["error"], dict) and ".tag" in data["error"]:
+                        error_type = data["error"][".tag"]
                         logger.error(f"Error type: {error_type}")
                         
                         # Special handling for common error types
                         if error_type == "path":
                             # Extract more details about path errors
-                            path_error = error_data["error"].get("path", {})
+                            path_error = data["error"].get("path", {})
                             path_error_tag = path_error.get(".tag") if isinstance(path_error, dict) else None
                             logger.error(f"Path error type: {path_error_tag}")
-                    
-            except ValueError:
-                logger.error(f"Response was not valid JSON: {response.text[:200]}")
+            else:
+                logger.error(f"Response was not valid JSON (status {status})")
             
-            self._handle_api_error(response, user_id)
+            await self._handle_api_error(status, data, user_id)
+    
+    async def list_folders_bulk(self, user_ids, path=""):
+        """
+        List the same folder for several users concurrently.
+        
+        Args:
+            user_ids: The users' IDs
+            path: Path to the folder (default: "" for root)
+            
+        Returns:
+            list: Folder contents or the raised exception for each user, in the order given
+        """
+        return await self._gather_bounded(self.list_folder(user_id, path) for user_id in user_ids)
+    
+    async def search_files_bulk(self, user_ids, query, path="", max_results=10):
+        """
+        Run the same search for several users concurrently.
+        
+        Args:
+            user_ids: The users' IDs
+            query: Search query
+            path: Path to search in (default: "" for root)
+            max_results: Maximum number of results to return per user
+            
+        Returns:
+            list: Search results or the raised exception for each user, in the order given
+        """
+        return await self._gather_bounded(
+            self.search_files(user_id, query, path, max_results) for user_id in user_ids
+        )
+    
+    async def get_temporary_links(self, user_id, paths):
+        """
+        Get temporary download links for several files concurrently.
+        
+        Args:
+            user_id: The user's ID
+            paths: Paths of the files
+            
+        Returns:
+            list: Temporary download URL or the raised exception for each path, in the order given
+        """
+        return await self._gather_bounded(self.get_temporary_link(user_id, path) for path in paths)
     
     async def share_file(self, user_id, path, settings=None):
         """
@@ -447,29 +612,27 @@ class DropboxService:
         if not token:
             raise self._create_auth_exception(user_id)
         
-        headers = {
-            "Authorization": f"Bearer {token}",
-            "Content-Type": "application/json"
-        }
+        headers = self._auth_headers(user_id, token)
         
         payload = {
             "path": path,
             "settings": settings or {}
         }
         
-        response = requests.post(
+        status, _, data = await self._request(
+            "POST",
             f"{DROPBOX_API_BASE_URL}sharing/create_shared_link_with_settings", 
             headers=headers, 
             json=payload
         )
         
-        if response.status_code == 200:
-            return response.json()
-        elif response.status_code == 409 and "shared_link_already_exists" in response.text:
-            # Link already exists, get existing links
-            return await self.get_shared_links(user_id, path)
+        if status == 200:
+            return data
+        elif status == 409 and "shared_link_already_exists" in (data or {}).get("error_summary", ""):
+            # Link already exists, get existing links with the token already loaded
+            return await self._list_shared_links(user_id, token, path)
         else:
-            self._handle_api_error(response, user_id)
+            await self._handle_api_error(status, data, user_id)
     
     async def get_shared_links(self, user_id, path):
         """
@@ -486,25 +649,136 @@ class DropboxService:
         if not token:
             raise self._create_auth_exception(user_id)
         
-        headers = {
-            "Authorization": f"Bearer {token}",
-            "Content-Type": "application/json"
-        }
+        return await self._list_shared_links(user_id, token, path)
+    
+    async def _list_shared_links(self, user_id, token, path):
+        """
+        List existing shared links for a file with an already loaded token.
+        
+        Args:
+            user_id: The user's ID
+            token: The access token
+            path: Path of the file
+            
+        Returns:
+            dict: Existing shared links
+        """
+        headers = self._auth_headers(user_id, token)
         
         payload = {
             "path": path
         }
         
-        response = requests.post(
+        status, _, data = await self._request(
+            "POST",
             f"{DROPBOX_API_BASE_URL}sharing/list_shared_links", 
             headers=headers, 
             json=payload
         )
         
-        if response.status_code == 200:
-            return response.json()
+        if status == 200:
+            return data
         else:
-            self._handle_api_error(response, user_id)
+            await self._handle_api_error(status, data, user_id)
+    
+    async def _gather_bounded(self, coroutines):
+        """
+        Await coroutines concurrently, at most MAX_CONCURRENT_BULK_REQUESTS at a time.
+        
+        Args:
+            coroutines: The coroutines to run
+            
+        Returns:
+            list: Each coroutine's result, or the exception it raised, in the order given
+        """
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_BULK_REQUESTS)
+        
+        async def run(coroutine):
+            async with semaphore:
+                return await coroutine
+        
+        return await asyncio.gather(*(run(coroutine) for coroutine in coroutines), return_exceptions=True)
+    
+    def _auth_headers(self, user_id, token):
+        """
+        Get JSON request headers for a token, reusing the ones built for the user's previous request.
+        
+        The returned dict is shared and must not be modified.
+        
+        Args:
+            user_id: The user's ID
+            token: The access token
+            
+        Returns:
+            dict: The request headers
+        """
+        cached = self._header_cache.get(user_id)
+        if cached is None or cached[0] != token:
+            cached = (token, {
+                "Authorization": f"Bearer {token}",
+                "Content-Type": "application/json"
+            })
+            self._header_cache[user_id] = cached
+        return cached[1]
+    
+    def _get_session(self):
+        """
+        Get the shared HTTP session, creating it on first use inside the running event loop.
+        
+        Returns:
+            aiohttp.ClientSession: The session
+        """
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=DROPBOX_CONNECTION_LIMIT,
+                    limit_per_host=DROPBOX_CONNECTION_LIMIT_PER_HOST,
+                    keepalive_timeout=DROPBOX_KEEPALIVE_TIMEOUT,
+                    ttl_dns_cache=300
+                ),
+                json_serialize=lambda obj: orjson.dumps(obj).decode()
+            )
+        return self._session
+    
+    async def close(self):
+        """Close the shared HTTP session."""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+    
+    async def _request(self, method, url, retry=True, **kwargs):
+        """
+        Send an HTTP request over the shared session, retrying rate-limited and transient failures.
+        
+        Args:
+            method: The HTTP method
+            url: The request URL
+            retry: Whether the request may be resent; False for requests that must not be applied twice
+            **kwargs: Additional arguments for aiohttp's request
+            
+        Returns:
+            tuple: (status code, response headers, parsed JSON body or None)
+        """
+        # A streamed file body is consumed by the first attempt and cannot be resent
+        replayable = retry and not hasattr(kwargs.get("data"), "read")
+        
+        for attempt in range(DROPBOX_MAX_RETRIES + 1):
+            async with self._get_session().request(method, url, **kwargs) as response:
+                if response.status not in _RETRY_STATUSES or not replayable or attempt == DROPBOX_MAX_RETRIES:
+                    try:
+                        data = await response.json(loads=orjson.loads, content_type=None)
+                    except ValueError:
+                        data = None
+                    return response.status, response.headers, data
+                status = response.status
+                retry_after = response.headers.get("Retry-After", "")
+            
+            if retry_after.isdigit():
+                delay = int(retry_after)
+            else:
+                delay = min(DROPBOX_RETRY_MAX_DELAY, DROPBOX_RETRY_BASE_DELAY * 2 ** attempt) + random.uniform(0, DROPBOX_RETRY_BASE_DELAY)
+            logger.warning("Dropbox request to %s returned %s, retrying in %.1fs", url, status, delay)
+            await asyncio.sleep(delay)
     
     async def _store_token(self, user_id, access_token, refresh_token, expires_in):
         """
@@ -519,17 +793,21 @@ class DropboxService:
         token_data = {
             "access_token": access_token,
             "refresh_token": refresh_token,
-            "expires_at": (datetime.utcnow() + timedelta(seconds=expires_in)).timestamp()
+            "expires_at": time.time() + expires_in
         }
+        self._token_cache[user_id] = (access_token, token_data["expires_at"])
+        self._missing_tokens.pop(user_id, None)
         
         # Serialize and encrypt the token data
-        serialized_token = json.dumps(token_data)
+        serialized_token = orjson.dumps(token_data)
         encrypted_token = TokenEncryptionHelper.encrypt_token(serialized_token, self.encryption_key)
         
         # Store in the token storage using the helper function
         token_record = create_token_record(encrypted_token)
         
-        self.token_storage.store_token(user_id, PLATFORM, SERVICE, token_record)
+        # Persist before returning so a failed write reaches the auth callback or refresh caller
+        if not await self.token_storage.store_token_async(user_id, PLATFORM, SERVICE, token_record, durable=True):
+            raise Exception("Failed to save token")
     
     async def _load_token(self, user_id):
         """
@@ -541,10 +819,71 @@ class DropboxService:
         Returns:
             str: The access token, or None if not found or expired
         """
-        token_record = self.token_storage.get_token(user_id, PLATFORM, SERVICE)
+        access_token = self._get_cached_token(user_id)
+        if access_token:
+            return access_token
+        if self._is_known_missing(user_id):
+            return None
+        
+        # One load or refresh per user at a time; others wait and reuse its result
+        async with self._token_locks[user_id]:
+            access_token = self._get_cached_token(user_id)
+            if access_token:
+                return access_token
+            if self._is_known_missing(user_id):
+                return None
+            
+            return await self._load_stored_token(user_id)
+    
+    def _is_known_missing(self, user_id):
+        """
+        Check whether a recent load found no usable token for the user.
+        
+        Args:
+            user_id: The user's ID
+            
+        Returns:
+            bool: True if a load found no stored token less than MISSING_TOKEN_TTL seconds ago
+        """
+        missing_until = self._missing_tokens.get(user_id)
+        if missing_until is None:
+            return False
+        if missing_until > time.time():
+            return True
+        del self._missing_tokens[user_id]
+        return False
+    
+    def _get_cached_token(self, user_id):
+        """
+        Get a cached access token that is not about to expire.
+        
+        Args:
+            user_id: The user's ID
+            
+        Returns:
+            str: The access token, or None if not cached or about to expire
+        """
+        cached = self._token_cache.get(user_id)
+        if cached and cached[1] - TOKEN_EXPIRY_MARGIN > time.time():
+            return cached[0]
+        return None
+    
+    async def _load_stored_token(self, user_id):
+        """
+        Load and decrypt a token from the token storage, refreshing it if expired.
+        
+        Args:
+            user_id: The user's ID
+            
+        Returns:
+            str: The access token, or None if not found or expired
+        """
+        token_record = await self.token_storage.get_token_async(user_id, PLATFORM, SERVICE)
         
         if not token_record or not token_record.get("is_active") or token_record.get("is_revoked"):
             logger.info(f"No valid token found in the storage for user {user_id}")
+            # Only a real absence is remembered; storage or refresh errors are retried on the next call
+            self._missing_tokens[user_id] = time.time() + MISSING_TOKEN_TTL
             return None
         
         try:
@@ -553,15 +892,21 @@ class DropboxService:
                 return None
             
             decrypted_token = TokenEncryptionHelper.decrypt_token(encrypted_token, self.encryption_key)
-            token_data = json.loads(decrypted_token)
+            if TokenEncryptionHelper.is_legacy_token(encrypted_token):
+                # Migrate tokens still encrypted with Fernet to AES-GCM
+                await self.token_storage.store_token_async(user_id, PLATFORM, SERVICE, {
+                    **token_record,
+                    "encrypted_token": TokenEncryptionHelper.encrypt_token(decrypted_token, self.encryption_key)
+                })
+            token_data = orjson.loads(decrypted_token)
             
             if not token_data:
                 logger.error("Failed to deserialize token data")
                 return None
             
-            # Check if token is expired
+            # Check if token is expired or about to expire
             expires_at = token_data.get("expires_at")
-            if expires_at and expires_at <= datetime.utcnow().timestamp():
+            if expires_at and expires_at - TOKEN_REFRESH_SKEW <= time.time():
                 logger.info(f"Token expired for user {user_id}, attempting to refresh")
                 refresh_token = token_data.get("refresh_token")
                 if refresh_token:
@@ -572,7 +917,10 @@ class DropboxService:
                         return None
                 return None
             
-            return token_data.get("access_token")
+            access_token = token_data.get("access_token")
+            if access_token and expires_at:
+                self._token_cache[user_id] = (access_token, expires_at)
+            return access_token
         except Exception as e:
             logger.error(f"Error loading token: {str(e)}")
             return None
@@ -601,10 +949,10 @@ class DropboxService:
         }
         
         logger.info(f"Attempting to refresh token for user {user_id}")
-        response = requests.post(f"{DROPBOX_AUTH_BASE_URL}token", data=payload)
-        response_data = response.json()
+        status, _, response_data = await self._request("POST", f"{DROPBOX_AUTH_BASE_URL}token", data=payload)
+        response_data = response_data or {}
         
-        if response.status_code == 200 and "access_token" in response_data:
+        if status == 200 and "access_token" in response_data:
             # Note: Dropbox might not return a new refresh token, so keep the old one if none returned
             new_refresh_token = response_data.get("refresh_token", refresh_token)
             expires_in = response_data.get("expires_in", 14400)  # 4 hours in seconds
@@ -621,43 +969,53 @@ class DropboxService:
             error_msg = response_data.get("error_description", "Unknown error")
             logger.error(f"Failed to refresh token: {error_msg}")
             # If refresh fails, mark the token as revoked so we don't keep trying
-            token_record = self.token_storage.get_token(user_id, PLATFORM, SERVICE)
-            if token_record:
-                token_record["is_revoked"] = True
-                self.token_storage.store_token(user_id, PLATFORM, SERVICE, token_record)
+            self._token_cache.pop(user_id, None)
+            self._header_cache.pop(user_id, None)
+            await self._mark_token_revoked(user_id)
             raise Exception(f"Failed to refresh token: {error_msg}")
     
-    def _handle_api_error(self, response, user_id):
+    async def _mark_token_revoked(self, user_id):
+        """
+        Mark a user's stored token as revoked so it is not used again.
+        
+        Args:
+            user_id: The user's ID
+        """
+        token_record = await self.token_storage.get_token_async(user_id, PLATFORM, SERVICE)
+        if token_record:
+            # Copy instead of modifying the record, which may be shared with the storage cache
+            token_record = {**token_record, "is_revoked": True}
+            await self.token_storage.store_token_async(user_id, PLATFORM, SERVICE, token_record)
+    
+    async def _handle_api_error(self, status, data, user_id):
         """
         Handle API errors and check for authentication issues.
         
         Args:
-            response: The response object
+            status: The response status code
+            data: The parsed JSON response body, or None if it was not JSON
             user_id: The user's ID
             
         Raises:
             Exception: With appropriate error message
         """
-        try:
-            error_data = response.json()
-            error_summary = error_data.get("error_summary", "Unknown error")
-            
-            # Check if this is an authentication error
-            if response.status_code in (401, 403):
-                # Mark token as revoked
-                token_record = self.token_storage.get_token(user_id, PLATFORM, SERVICE)
-                if token_record:
-                    token_record["is_revoked"] = True
-                    self.token_storage.store_token(user_id, PLATFORM, SERVICE, token_record)
-                
-                # Raise authentication exception
-                raise self._create_auth_exception(user_id)
+        # Check if this is an authentication error
+        if status in (401, 403):
+            # Mark token as revoked
+            self._token_cache.pop(user_id, None)
+            self._header_cache.pop(user_id, None)
+            await self._mark_token_revoked(user_id)
             
-            # For other errors
-            raise Exception(f"Dropbox API request failed: {error_summary}")
-        except ValueError:
+            # Raise authentication exception
+            raise self._create_auth_exception(user_id)
+        
+        if not isinstance(data, dict):
             # Response couldn't be parsed as JSON
-            raise Exception(f"Dropbox API request failed with status code: {response.status_code}")
+            raise Exception(f"Dropbox API request failed with status code: {status}")
+        
+        # For other errors
+        error_summary = data.get("error_summary", "Unknown error")
+        raise Exception(f"Dropbox API request failed: {error_summary}")
     
     def _create_auth_exception(self, user_id):
         """
@@ -673,4 +1031,19 @@ class DropboxService:
         return Exception(
             "Your Dropbox authorization has expired or is invalid. "
             "Please use the `!authorize-dropbox` command to reconnect your Dropbox account."
-        )
\ No newline at end of file
+        )
+
+
+@lru_cache(maxsize=1)
+def get_default_dropbox_service():
+    """
+    Get the process-wide DropboxService configured from the environment.
+    
+    Use this instead of DropboxService() so .env parsing, key loading and the token
+    and connection caches are shared by every caller. Construct DropboxService(config=...)
+    directly only when a separately configured instance is needed.
+    
+    Returns:
+        DropboxService: The shared service
+    """
+    return DropboxService()
@@ -36,6 +36,9 @@ GOOGLE_REVOKE_URL = "https://oauth2.googleapis.com/revoke"
 # Scopes for Gmail API
 SCOPES = ['https://www.googleapis.com/auth/gmail.readonly', 'https://www.googleapis.com/auth/gmail.send']
 
+# Maximum number of requests sent in a single Gmail batch call
+GMAIL_BATCH_SIZE = 50
+
 
 class GmailService:
     def __init__(self, config=None):
@@ -108,13 +111,14 @@ class GmailService:
         logger.info(f"Generated authorization URL for user {user_id}")
         return auth_url
     
-    async def handle_auth_callback(self, state, code):
+    async def handle_auth_callback(self, state, code, user_id=None):
         """
         Handle the authorization callback from Google.
         
         Args:
             state: The state parameter from the callback
             code: The authorization code from the callback
+            user_id: The user ID already decrypted from state, if available
         """
         if not self.client_id:
             raise ValueError("Google Client ID is not set in configuration.")
@@ -123,8 +127,9 @@ class GmailService:
         if not self.redirect_uri:
             raise ValueError("Google Redirect URI is not set in configuration.")
         
-        # Decrypt the user_id from state
-        user_id = TokenEncryptionHelper.decrypt_token(state, self.encryption_key)
+        # Decrypt the user_id from state unless the caller already did
+        if user_id is None:
+            user_id = TokenEncryptionHelper.decrypt_token(state, self.encryption_key)
         logger.info(f"Processing authorization callback for user {user_id}")
         
         # Create a Flow instance
@@ -207,7 +212,58 @@ class GmailService:
         except Exception as e:
             logger.error(f"Failed to get email: {str(e)}")
             raise Exception(f"Failed to get email: {str(e)}")
-    
+
+    async def get_emails_batch(self, user_id, message_ids):
+        """
+        Get several email messages using batched API requests.
+
+        Args:
+            user_id: The user's ID
+            message_ids: The IDs of the messages to retrieve
+
+        Returns:
+            list: The full message data for every message, in the same order as message_ids
+
+        Raises:
+            Exception: If a message can be fetched neither in a batch nor on its own
+        """
+        # Batch request IDs must be unique
+        message_ids = list(dict.fromkeys(message_ids))
+        if not message_ids:
+            return []
+
+        service = await self._get_gmail_service(user_id)
+
+        try:
+            messages = {}
+            failed_ids = []
+
+            def callback(request_id, response, exception):
+                if exception is not None or not response or "id" not in response:
+                    logger.warning(f"Failed to get email {request_id} in batch: {str(exception or 'empty response')}")
+                    failed_ids.append(request_id)
+                    return
+                messages[request_id] = response
+
+            # Gmail recommends keeping batches at or below 50 requests
+            for start in range(0, len(message_ids), GMAIL_BATCH_SIZE):
+                batch = service.new_batch_http_request(callback=callback)
+                for message_id in message_ids[start:start + GMAIL_BATCH_SIZE]:
+                    batch.add(
+                        service.users().messages().get(userId='me', id=message_id, format='full'),
+                        request_id=message_id
+                    )
+                await self._execute_request(batch)
+        except Exception as e:
+            logger.error(f"Failed to get emails: {str(e)}")
+            raise Exception(f"Failed to get emails: {str(e)}")
+
+        # Retry failed batch items on their own so callers never see a bare stub
+        for message_id in failed_ids:
+            messages[message_id] = await self.get_email(user_id, message_id)
+
+        return [messages[message_id] for message_id in message_ids]
+
     async def get_recent_emails(self, user_id, max_results=10, unread_only=False):
         """
         Get recent emails from the user's inbox.
@@ -513,7 +569,9 @@ class GmailService:
         # Store in the token storage using the helper function
         token_record = create_token_record(encrypted_token)
         
-        self.token_storage.store_token(user_id, PLATFORM, SERVICE, token_record)
+        # Persist before returning so a failed write reaches the auth callback or refresh caller
+        if not await self.token_storage.store_token_async(user_id, PLATFORM, SERVICE, token_record, durable=True):
+            raise Exception("Failed to save token")
     
     async def _get_token_data(self, user_id):
         """
@@ -537,6 +595,12 @@ class GmailService:
                 return None
             
             decrypted_token = TokenEncryptionHelper.decrypt_token(encrypted_token, self.encryption_key)
+            if TokenEncryptionHelper.is_legacy_token(encrypted_token):
+                # Migrate tokens still encrypted with Fernet to AES-GCM
+                await self.token_storage.store_token_async(user_id, PLATFORM, SERVICE, {
+                    **token_record,
+                    "encrypted_token": TokenEncryptionHelper.encrypt_token(decrypted_token, self.encryption_key)
+                })
             token_data = json.loads(decrypted_token)
             
             return token_data
@@ -618,7 +682,8 @@ class GmailService:
             # If refresh fails, mark the token as revoked so we don't keep trying
             token_record = self.token_storage.get_token(user_id, PLATFORM, SERVICE)
             if token_record:
-                token_record["is_revoked"] = True
+                # Copy instead of modifying the record, which may be shared with the storage cache
+                token_record = {**token_record, "is_revoked": True}
                 self.token_storage.store_token(user_id, PLATFORM, SERVICE, token_record)
             raise Exception(f"Failed to refresh token: {error_msg}")
     
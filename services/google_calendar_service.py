@@ -1,5 +1,6 @@
 import os
 import json
+import asyncio
 import logging
 from datetime import datetime, timedelta
 from urllib.parse import urlencode
@@ -104,13 +105,14 @@ class GoogleCalendarService:
         logger.info(f"Generated authorization URL for user {user_id}")
         return auth_url
     
-    async def handle_auth_callback(self, state, code):
+    async def handle_auth_callback(self, state, code, user_id=None):
         """
         Handle the authorization callback from Google.
         
         Args:
             state: The state parameter from the callback
             code: The authorization code from the callback
+            user_id: The user ID already decrypted from state, if available
         """
         if not self.client_id:
             raise ValueError("Google Client ID is not set in configuration.")
@@ -119,8 +121,9 @@ class GoogleCalendarService:
         if not self.redirect_uri:
             raise ValueError("Google Calendar Redirect URI is not set in configuration.")
         
-        # Decrypt the user_id from state
-        user_id = TokenEncryptionHelper.decrypt_token(state, self.encryption_key)
+        # Decrypt the user_id from state unless the caller already did
+        if user_id is None:
+            user_id = TokenEncryptionHelper.decrypt_token(state, self.encryption_key)
         logger.info(f"Processing authorization callback for user {user_id}")
         
         # Create a Flow instance - but don't specify scopes this time
@@ -196,7 +199,7 @@ class GoogleCalendarService:
         service = await self._get_calendar_service(user_id)
         
         try:
-            calendar = service.calendars().get(calendarId='primary').execute()
+            calendar = await self._execute_request(service.calendars().get(calendarId='primary'))
             return {"timezone": calendar['timeZone']}
         except Exception as e:
             logger.error(f"Failed to get user timezone: {str(e)}")
@@ -222,14 +225,14 @@ class GoogleCalendarService:
             start_date_rfc = start_date.isoformat() + 'Z'
             end_date_rfc = end_date.isoformat() + 'Z'
             
-            events_result = service.events().list(
+            events_result = await self._execute_request(service.events().list(
                 calendarId='primary',
                 timeMin=start_date_rfc,
                 timeMax=end_date_rfc,
                 maxResults=max_results,
                 singleEvents=True,
                 orderBy='startTime'
-            ).execute()
+            ))
             
             events = events_result.get('items', [])
             return events
@@ -251,10 +254,10 @@ class GoogleCalendarService:
         service = await self._get_calendar_service(user_id)
         
         try:
-            event = service.events().insert(
+            event = await self._execute_request(service.events().insert(
                 calendarId='primary',
                 body=event_details
-            ).execute()
+            ))
             
             return event
         except Exception as e:
@@ -276,11 +279,11 @@ class GoogleCalendarService:
         service = await self._get_calendar_service(user_id)
         
         try:
-            event = service.events().update(
+            event = await self._execute_request(service.events().update(
                 calendarId='primary',
                 eventId=event_id,
                 body=updated_event
-            ).execute()
+            ))
             
             return event
         except Exception as e:
@@ -298,10 +301,10 @@ class GoogleCalendarService:
         service = await self._get_calendar_service(user_id)
         
         try:
-            service.events().delete(
+            await self._execute_request(service.events().delete(
                 calendarId='primary',
                 eventId=event_id
-            ).execute()
+            ))
             
             logger.info(f"Successfully deleted event {event_id}")
         except Exception as e:
@@ -322,10 +325,10 @@ class GoogleCalendarService:
         service = await self._get_calendar_service(user_id)
         
         try:
-            event = service.events().get(
+            event = await self._execute_request(service.events().get(
                 calendarId='primary',
                 eventId=event_id
-            ).execute()
+            ))
             
             return event
         except Exception as e:
@@ -347,13 +350,13 @@ class GoogleCalendarService:
         service = await self._get_calendar_service(user_id)
         
         try:
-            events_result = service.events().list(
+            events_result = await self._execute_request(service.events().list(
                 calendarId='primary',
                 q=query,
                 maxResults=max_results,
                 singleEvents=True,
                 orderBy='startTime'
-            ).execute()
+            ))
             
             return events_result
         except Exception as e:
@@ -373,10 +376,10 @@ class GoogleCalendarService:
         
         try:
             # Get the event first
-            event = service.events().get(
+            event = await self._execute_request(service.events().get(
                 calendarId='primary',
                 eventId=event_id
-            ).execute()
+            ))
             
             # Initialize attendees list if it doesn't exist
             if 'attendees' not in event:
@@ -386,11 +389,11 @@ class GoogleCalendarService:
             event['attendees'].append({'email': shared_email})
             
             # Update the event
-            updated_event = service.events().update(
+            updated_event = await self._execute_request(service.events().update(
                 calendarId='primary',
                 eventId=event_id,
                 body=event
-            ).execute()
+            ))
             
             logger.info(f"Successfully shared event {event_id} with {shared_email}")
             return updated_event
@@ -417,7 +420,7 @@ class GoogleCalendarService:
                 'timeZone': 'UTC'
             }
             
-            created_calendar = service.calendars().insert(body=calendar).execute()
+            created_calendar = await self._execute_request(service.calendars().insert(body=calendar))
             
             logger.info(f"Successfully created calendar: {calendar_name}")
             return created_calendar['id']
@@ -425,6 +428,20 @@ class GoogleCalendarService:
             logger.error(f"Failed to create calendar: {str(e)}")
             raise Exception(f"Failed to create calendar: {str(e)}")
     
+    @staticmethod
+    async def _execute_request(request):
+        """
+        Execute a Google Calendar API request without blocking the event loop.
+        
+        Args:
+            request: The Google Calendar API request object
+            
+        Returns:
+            dict: The response from the API
+        """
+        # The client library is synchronous, so run the HTTP call in a worker thread
+        return await asyncio.to_thread(request.execute)
+    
     async def _store_token(self, user_id, access_token, refresh_token, expires_in):
         """
         Store a token in the token storage.
@@ -448,7 +465,9 @@ class GoogleCalendarService:
         # Store in the token storage using the helper function
         token_record = create_token_record(encrypted_token)
         
-        self.token_storage.store_token(user_id, PLATFORM, SERVICE, token_record)
+        # Persist before returning so a failed write reaches the auth callback or refresh caller
+        if not await self.token_storage.store_token_async(user_id, PLATFORM, SERVICE, token_record, durable=True):
+            raise Exception("Failed to save token")
     
     async def _get_token_data(self, user_id):
         """
@@ -472,6 +491,12 @@ class GoogleCalendarService:
                 return None
             
             decrypted_token = TokenEncryptionHelper.decrypt_token(encrypted_token, self.encryption_key)
+            if TokenEncryptionHelper.is_legacy_token(encrypted_token):
+                # Migrate tokens still encrypted with Fernet to AES-GCM
+                await self.token_storage.store_token_async(user_id, PLATFORM, SERVICE, {
+                    **token_record,
+                    "encrypted_token": TokenEncryptionHelper.encrypt_token(decrypted_token, self.encryption_key)
+                })
             token_data = json.loads(decrypted_token)
             
             return token_data
@@ -553,7 +578,8 @@ class GoogleCalendarService:
             # If refresh fails, mark the token as revoked so we don't keep trying
             token_record = self.token_storage.get_token(user_id, PLATFORM, SERVICE)
             if token_record:
-                token_record["is_revoked"] = True
+                # Copy instead of modifying the record, which may be shared with the storage cache
+                token_record = {**token_record, "is_revoked": True}
                 self.token_storage.store_token(user_id, PLATFORM, SERVICE, token_record)
             raise Exception(f"Failed to refresh token: {error_msg}")
     
@@ -1,5 +1,6 @@
 import os
 import json
+import asyncio
 import logging
 from datetime import datetime, timedelta
 from urllib.parse import urlencode
@@ -25,6 +26,9 @@ logger = logging.getLogger("google_drive_service")
 PLATFORM = "Google"
 SERVICE = "GoogleDriveService"
 
+# Drive accepts at most 100 calls in a single batch request
+DRIVE_BATCH_SIZE = 100
+
 # API URLs
 GOOGLE_AUTH_BASE_URL = "https://accounts.google.com/o/oauth2/"
 GOOGLE_TOKEN_URL = "https://oauth2.googleapis.com/token"
@@ -105,13 +109,14 @@ class GoogleDriveService:
         logger.info(f"Generated authorization URL for user {user_id}")
         return auth_url
     
-    async def handle_auth_callback(self, state, code):
+    async def handle_auth_callback(self, state, code, user_id=None):
         """
         Handle the authorization callback from Google.
         
         Args:
             state: The state parameter from the callback
             code: The authorization code from the callback
+            user_id: The user ID already decrypted from state, if available
         """
         if not self.client_id:
             raise ValueError("Google Client ID is not set in configuration.")
@@ -120,8 +125,9 @@ class GoogleDriveService:
         if not self.redirect_uri:
             raise ValueError("Google Redirect URI is not set in configuration.")
         
-        # Decrypt the user_id from state
-        user_id = TokenEncryptionHelper.decrypt_token(state, self.encryption_key)
+        # Decrypt the user_id from state unless the caller already did
+        if user_id is None:
+            user_id = TokenEncryptionHelper.decrypt_token(state, self.encryption_key)
         logger.info(f"Processing authorization callback for user {user_id}")
         
         # Create a Flow instance - but don't specify scopes this time
@@ -205,10 +211,10 @@ class GoogleDriveService:
         }
         
         try:
-            folder = service.files().create(
+            folder = await self._execute_request(service.files().create(
                 body=folder_metadata,
                 fields='id, name, mimeType, webViewLink'
-            ).execute()
+            ))
             
             return folder
         except Exception as e:
@@ -245,16 +251,16 @@ class GoogleDriveService:
         if description:
             file_metadata['description'] = description
         
-        # Create a media upload instance
-        media = MediaFileUpload(file_path, mimetype=mime_type, resumable=True)
+        # Create a media upload instance (opens the file, so keep it off the event loop)
+        media = await asyncio.to_thread(MediaFileUpload, file_path, mimetype=mime_type, resumable=True)
         
         # Upload the file
         try:
-            file = service.files().create(
+            file = await self._execute_request(service.files().create(
                 body=file_metadata,
                 media_body=media,
                 fields='id, name, mimeType, webViewLink'
-            ).execute()
+            ))
             
             return file
         except Exception as e:
@@ -272,7 +278,7 @@ class GoogleDriveService:
         service = await self._get_drive_service(user_id)
         
         try:
-            service.files().delete(fileId=file_id).execute()
+            await self._execute_request(service.files().delete(fileId=file_id))
             logger.info(f"Successfully deleted file {file_id}")
         except Exception as e:
             logger.error(f"Failed to delete file: {str(e)}")
@@ -304,13 +310,13 @@ class GoogleDriveService:
         
         while True:
             try:
-                response = service.files().list(
+                response = await self._execute_request(service.files().list(
                     q=q,
                     pageSize=page_size,
                     spaces='drive',
                     fields='nextPageToken, files(id, name, mimeType, size, modifiedTime, webViewLink)',
                     pageToken=page_token
-                ).execute()
+                ))
                 
                 results.extend(response.get('files', []))
                 page_token = response.get('nextPageToken')
@@ -337,16 +343,71 @@ class GoogleDriveService:
         service = await self._get_drive_service(user_id)
         
         try:
-            file = service.files().get(
+            file = await self._execute_request(service.files().get(
                 fileId=file_id,
                 fields='id, name, mimeType, size, modifiedTime, webViewLink, webContentLink'
-            ).execute()
+            ))
             
             return file
         except Exception as e:
             logger.error(f"Failed to get file: {str(e)}")
             raise Exception(f"Failed to get file: {str(e)}")
     
+    async def get_files_batch(self, user_id, file_ids):
+        """
+        Get several files' metadata from Google Drive using batched API requests.
+        
+        Args:
+            user_id: The user's ID
+            file_ids: IDs of the files
+            
+        Returns:
+            list: The metadata of every file that could be fetched, in the same order as file_ids
+        """
+        # Batch request IDs must be unique
+        file_ids = list(dict.fromkeys(file_ids))
+        if not file_ids:
+            return []
+        
+        service = await self._get_drive_service(user_id)
+        
+        try:
+            files = {}
+            failed_ids = []
+            
+            def callback(request_id, response, exception):
+                if exception is not None or not response or "id" not in response:
+                    logger.warning(f"Failed to get file {request_id} in batch: {str(exception or 'empty response')}")
+                    failed_ids.append(request_id)
+                    return
+                files[request_id] = response
+            
+            for start in range(0, len(file_ids), DRIVE_BATCH_SIZE):
+                batch = service.new_batch_http_request(callback=callback)
+                for file_id in file_ids[start:start + DRIVE_BATCH_SIZE]:
+                    batch.add(
+                        service.files().get(
+                            fileId=file_id,
+                            fields='id, name, mimeType, size, modifiedTime, webViewLink, webContentLink'
+                        ),
+                        request_id=file_id
+                    )
+                await self._execute_request(batch)
+        except Exception as e:
+            logger.error(f"Failed to get files: {str(e)}")
+            raise Exception(f"Failed to get files: {str(e)}")
+        
+        # Retry failed batch items on their own; files that still fail are left out rather than stubbed
+        retried = await asyncio.gather(
+            *(self.get_file(user_id, file_id) for file_id in failed_ids),
+            return_exceptions=True
+        )
+        for file_id, file in zip(failed_ids, retried):
+            if not isinstance(file, Exception):
+                files[file_id] = file
+        
+        return [files[file_id] for file_id in file_ids if file_id in files]
+    
     async def download_file(self, user_id, file_id, local_path=None):
         """
         Download a file from Google Drive.
@@ -363,7 +424,7 @@ class GoogleDriveService:
         
         try:
             # Get file metadata to get file name if not provided
-            file_metadata = service.files().get(fileId=file_id, fields='name').execute()
+            file_metadata = await self._execute_request(service.files().get(fileId=file_id, fields='name'))
             
             # Create request to download file
             request = service.files().get_media(fileId=file_id)
@@ -412,16 +473,16 @@ class GoogleDriveService:
         
         try:
             # Get current parents
-            file = service.files().get(fileId=file_id, fields='parents').execute()
+            file = await self._execute_request(service.files().get(fileId=file_id, fields='parents'))
             previous_parents = ",".join(file.get('parents', []))
             
             # Move the file to the new folder
-            file = service.files().update(
+            file = await self._execute_request(service.files().update(
                 fileId=file_id,
                 addParents=new_parent_folder_id,
                 removeParents=previous_parents,
                 fields='id, parents'
-            ).execute()
+            ))
             
             return file
         except Exception as e:
@@ -453,13 +514,13 @@ class GoogleDriveService:
             
             while True:
                 logger.info(f"Making API request to search files with query: name contains '{query}'")
-                response = service.files().list(
+                response = await self._execute_request(service.files().list(
                     q=f"name contains '{query}' and trashed = false",
                     spaces='drive',
                     fields='nextPageToken, files(id, name, mimeType, size, modifiedTime, webViewLink)',
                     pageSize=max_results,
                     pageToken=page_token
-                ).execute()
+                ))
                 
                 files_found = response.get('files', [])
                 logger.info(f"API returned {len(files_found)} files for this page")
@@ -507,13 +568,13 @@ class GoogleDriveService:
             page_token = None
             
             while True:
-                response = service.files().list(
+                response = await self._execute_request(service.files().list(
                     q=q,
                     spaces='drive',
                     fields='nextPageToken, files(id, name, mimeType, size, modifiedTime, webViewLink)',
                     pageSize=max_results,
                     pageToken=page_token
-                ).execute()
+                ))
                 
                 results.extend(response.get('files', []))
                 page_token = response.get('nextPageToken')
@@ -607,11 +668,11 @@ class GoogleDriveService:
         
         try:
             # Create the permission
-            result = service.permissions().create(
+            result = await self._execute_request(service.permissions().create(
                 fileId=file_id,
                 body=permission,
                 fields='id'
-            ).execute()
+            ))
             
             return result
         except Exception as e:
@@ -633,10 +694,10 @@ class GoogleDriveService:
         
         try:
             # Get comments for the document
-            result = service.comments().list(
+            result = await self._execute_request(service.comments().list(
                 fileId=document_id,
                 fields='comments(id, content, anchor, htmlContent, quotedFileContent)'
-            ).execute()
+            ))
             
             # Format the comments similar to the C# implementation
             formatted_comments = []
@@ -678,11 +739,11 @@ class GoogleDriveService:
         try:
             # Copy the document
             body = {'name': new_title}
-            file = service.files().copy(
+            file = await self._execute_request(service.files().copy(
                 fileId=source_file_id, 
                 body=body,
                 fields='id, webViewLink'
-            ).execute()
+            ))
             
             return file['id']
         except Exception as e:
@@ -712,12 +773,12 @@ class GoogleDriveService:
             page_token = None
             
             while True:
-                response = service.files().list(
+                response = await self._execute_request(service.files().list(
                     q=q,
                     spaces='drive',
                     fields='nextPageToken, files(id, name, createdTime)',
                     pageToken=page_token
-                ).execute()
+                ))
                 
                 results.extend(response.get('files', []))
                 page_token = response.get('nextPageToken')
@@ -730,6 +791,20 @@ class GoogleDriveService:
             logger.error(f"Failed to get folders: {str(e)}")
             raise Exception(f"Failed to get folders: {str(e)}")
     
+    @staticmethod
+    async def _execute_request(request):
+        """
+        Execute a Google Drive API request without blocking the event loop.
+        
+        Args:
+            request: The Google Drive API request object
+            
+        Returns:
+            dict: The response from the API
+        """
+        # The client library is synchronous, so run the HTTP call in a worker thread
+        return await asyncio.to_thread(request.execute)
+    
     async def _store_token(self, user_id, access_token, refresh_token, expires_in):
         """
         Store a token in the token storage.
@@ -753,7 +828,9 @@ class GoogleDriveService:
         # Store in the token storage using the helper function
         token_record = create_token_record(encrypted_token)
         
-        self.token_storage.store_token(user_id, PLATFORM, SERVICE, token_record)
+        # Persist before returning so a failed write reaches the auth callback or refresh caller
+        if not await self.token_storage.store_token_async(user_id, PLATFORM, SERVICE, token_record, durable=True):
+            raise Exception("Failed to save token")
     
     async def _get_token_data(self, user_id):
         """
@@ -777,6 +854,12 @@ class GoogleDriveService:
                 return None
             
             decrypted_token = TokenEncryptionHelper.decrypt_token(encrypted_token, self.encryption_key)
+            if TokenEncryptionHelper.is_legacy_token(encrypted_token):
+                # Migrate tokens still encrypted with Fernet to AES-GCM
+                await self.token_storage.store_token_async(user_id, PLATFORM, SERVICE, {
+                    **token_record,
+                    "encrypted_token": TokenEncryptionHelper.encrypt_token(decrypted_token, self.encryption_key)
+                })
             token_data = json.loads(decrypted_token)
             
             return token_data
@@ -858,7 +941,8 @@ class GoogleDriveService:
             # If refresh fails, mark the token as revoked so we don't keep trying
             token_record = self.token_storage.get_token(user_id, PLATFORM, SERVICE)
             if token_record:
-                token_record["is_revoked"] = True
+                # Copy instead of modifying the record, which may be shared with the storage cache
+                token_record = {**token_record, "is_revoked": True}
                 self.token_storage.store_token(user_id, PLATFORM, SERVICE, token_record)
             raise Exception(f"Failed to refresh token: {error_msg}")
     
@@ -959,11 +1043,11 @@ class GoogleDriveService:
                     'value': target_text
                 }
             
-            result = service.comments().create(
+            result = await self._execute_request(service.comments().create(
                 fileId=file_id,
                 body=comment,
                 fields='id, content, anchor'
-            ).execute()
+            ))
             
             return result
         except Exception as e: